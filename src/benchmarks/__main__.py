@@ -0,0 +1,7 @@
+import sys
+
+from benchmarks.run import main
+
+# execution: python -m benchmarks [options], from the src folder
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,135 @@
+import os
+import json
+import random
+from datetime import datetime, timedelta
+
+from models.config import KOVAAKS_STATS_SUBPATH, KOVAAKS_PLAYLISTS_SUBPATH
+from models.statsindex import STAT_FILENAME_SEPARATOR, STAT_FILENAME_TIMESTAMP_FORMAT
+
+SYNTHETIC_PLAYLIST_NAME = 'Benchmark'
+SYNTHETIC_PLAYLIST_FILENAME = 'benchmark.json'
+
+# runs played back to back in a session, and seconds between them
+SESSION_RUNS_RANGE = (3, 12)
+SESSION_RUN_GAP_RANGE = (70, 180)
+
+KILL_EVENT_HEADER = 'Kill #,Timestamp,Bot,Weapon,TTK,Shots,Hits,Accuracy,Damage Done,Damage Possible,Efficiency,Cheated'
+WEAPON_HEADER = 'Weapon,Shots,Hits,Damage Done,Damage Possible'
+
+# returns the content of one stat file, with the kill events, weapons, summary and settings blocks
+def make_stat_file_content(rng, scenario_name, timestamp, skill):
+	kills = max(1, int(rng.gauss(40*skill, 6)))
+	fight_time = 60.0
+	hits = 0
+	shots = 0
+	damage = 0.0
+
+	lines = [KILL_EVENT_HEADER]
+	t = 0.0
+	for k in range(kills):
+		ttk = max(0.05, rng.gauss(fight_time/kills, 0.2))
+		t += ttk
+		kill_shots = rng.randint(2, 6)
+		kill_hits = rng.randint(1, kill_shots)
+		hits += kill_hits
+		shots += kill_shots
+		damage += 100.0
+		kill_time = timestamp + timedelta(seconds=t)
+		lines.append(f'{k+1},{kill_time.strftime("%H:%M:%S")}.{kill_time.microsecond//1000:03d},Bot,Pistol,{ttk:.6f}s,{kill_shots},{kill_hits},{kill_hits/kill_shots:.6f},100.0,100.0,1.0,false')
+
+	lines.append('')
+	lines.append(WEAPON_HEADER)
+	lines.append(f'Pistol,{shots},{hits},{damage:.1f},{damage:.1f}')
+	lines.append('')
+
+	summary = [
+		('Kills', kills),
+		('Deaths', 0),
+		('Fight Time', f'{fight_time:.6f}'),
+		('Avg TTK', f'{fight_time/kills:.6f}'),
+		('Damage Done', f'{damage:.6f}'),
+		('Damage Taken', '0.000000'),
+		('Midairs', 0),
+		('Midaired', 0),
+		('Directs', 0),
+		('Directed', 0),
+		('Distance Traveled', f'{rng.uniform(0, 50):.6f}'),
+		('Score', f'{kills*10*skill + rng.gauss(0, 20):.6f}'),
+		('Scenario', scenario_name),
+		('Hash', f'{rng.getrandbits(128):032x}'),
+		('Game Version', '3.0.0.2022-04-01-12-00'),
+		('Challenge Start', timestamp.strftime('%H:%M:%S.000')),
+		('Hit Count', hits),
+		('Miss Count', shots - hits),
+		('Reloads', 0),
+		('MBS Points', 0),
+		('Time Remaining', '0.000000'),
+		('Pause Count', 0),
+		('Pause Duration', '0.000000'),
+	]
+	lines.extend(f'{key}:,{value}' for key, value in summary)
+	lines.append('')
+
+	lines.append('Input Lag:,0')
+	lines.append('Max FPS (config):,0')
+	lines.append('Sens Scale:,cm/360')
+	lines.append(f'Horiz Sens:,{rng.choice([25.0, 30.0, 34.6, 40.0])}')
+	lines.append(f'Vert Sens:,{rng.choice([25.0, 30.0, 34.6, 40.0])}')
+	lines.append('FOV:,103.0')
+	lines.append('FOVScale:,Overwatch')
+	lines.append(f'Avg FPS:,{rng.uniform(140, 240):.6f}')
+
+	return '\n'.join(lines) + '\n'
+
+def make_stat_file_path(stats_folder, scenario_name, timestamp):
+	return os.path.join(stats_folder, f'{scenario_name}{STAT_FILENAME_SEPARATOR}{timestamp.strftime(STAT_FILENAME_TIMESTAMP_FORMAT)}')
+
+# generates a synthetic kovaaks install folder, with a stats folder and a playlist of all the scenarios
+# scenarios_n: number of scenarios
+# runs_n: number of runs per scenario, played in sessions of a few runs
+# years_n: runs are spread over the last years_n years (floats accepted)
+# returns the list of stat file paths
+def generate_kovaaks_folder(kovaaks_folder, scenarios_n = 40, runs_n = 200, years_n = 1, seed = 0):
+	rng = random.Random(seed)
+
+	stats_folder = os.path.join(kovaaks_folder, KOVAAKS_STATS_SUBPATH)
+	playlists_folder = os.path.join(kovaaks_folder, KOVAAKS_PLAYLISTS_SUBPATH)
+	os.makedirs(stats_folder, exist_ok=True)
+	os.makedirs(playlists_folder, exist_ok=True)
+
+	scenarios_names = [f'Benchmark Scenario {i:03d}' for i in range(scenarios_n)]
+	now = datetime.now().replace(microsecond=0)
+	span_seconds = int(years_n*365*24*60*60)
+
+	scen_paths = []
+	for scenario_name in scenarios_names:
+		runs_left = runs_n
+		while runs_left > 0:
+			session_runs = min(runs_left, rng.randint(*SESSION_RUNS_RANGE))
+			session_start = now - timedelta(seconds=rng.randint(0, span_seconds))
+			skill = 1.0 - 0.5*(now - session_start).total_seconds()/max(1, span_seconds)
+
+			timestamp = session_start
+			for _ in range(session_runs):
+				# two sessions can start on the same second
+				scen_path = make_stat_file_path(stats_folder, scenario_name, timestamp)
+				while os.path.exists(scen_path):
+					timestamp += timedelta(seconds=1)
+					scen_path = make_stat_file_path(stats_folder, scenario_name, timestamp)
+
+				with open(scen_path, 'w') as fp:
+					fp.write(make_stat_file_content(rng, scenario_name, timestamp, skill))
+
+				scen_paths.append(scen_path)
+				timestamp += timedelta(seconds=rng.randint(*SESSION_RUN_GAP_RANGE))
+
+			runs_left -= session_runs
+
+	playlist = {
+		'playlistName': SYNTHETIC_PLAYLIST_NAME,
+		'scenarioList': [{'scenario_Name': scenario_name, 'play_Count': 1} for scenario_name in scenarios_names],
+	}
+	with open(os.path.join(playlists_folder, SYNTHETIC_PLAYLIST_FILENAME), 'w') as fp:
+		json.dump(playlist, fp)
+
+	return scen_paths
@@ -0,0 +1,219 @@
+import os
+import json
+import shutil
+import platform
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.generator import generate_kovaaks_folder, SYNTHETIC_PLAYLIST_NAME
+from models.config import Config
+import models.config as ckeys
+from models.playlist import Playlist
+from models.scenario import Scenario, TARGET_SCORE
+from models.scenario import read_summary
+from models.history import MERGE_MIN, MERGE_AVERAGE
+from models.statsindex import StatsIndex
+from models.statscache import StatsCache, STATS_CACHE_FILENAME
+from models.chartcache import CHART_CACHE_FOLDERNAME
+from models.ingest import parse_stat_files
+from models.report import Report
+import models.charts as charts
+
+BENCHMARK_RESULTS_VERSION = 1
+BENCHMARK_CONFIG_FILENAME = 'config.json'
+SRC_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs f repeats times, setup (if given) is called before every run and is not timed
+# returns the timings in seconds
+def time_call(f, repeats, setup = None):
+	timings = []
+	for _ in range(repeats):
+		if setup is not None:
+			setup()
+
+		t0 = time.perf_counter()
+		f()
+		timings.append(time.perf_counter() - t0)
+
+	return {
+		'min': min(timings),
+		'median': statistics.median(timings),
+		'mean': statistics.mean(timings),
+		'repeats': repeats,
+	}
+
+# config of the benchmark work folder, never written to disk
+# every run is analyzed, so the report load grows with years_n
+def make_config(work_folder, kovaaks_folder):
+	cfg = Config(os.path.join(work_folder, BENCHMARK_CONFIG_FILENAME), autosave=False)
+	cfg.set_option(ckeys.OPTIONKEY_DAYS_CHECK, False)
+	cfg.set_path(ckeys.PATHKEY_LOCAL_RESOURCES, os.path.join(SRC_FOLDER, 'resources'))
+	cfg.set_path(ckeys.PATHKEY_LOCAL_PLAYLISTS, os.path.join(work_folder, 'playlists'))
+	cfg.set_path(ckeys.PATHKEY_LOCAL_REPORTS, os.path.join(work_folder, 'reports'))
+	cfg.set_path(ckeys.PATHKEY_KOVAAKS_FOLDER, kovaaks_folder)
+
+	os.makedirs(cfg.get_path(ckeys.PATHKEY_LOCAL_PLAYLISTS), exist_ok=True)
+	os.makedirs(cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS), exist_ok=True)
+	return cfg
+
+def get_meta():
+	meta = {
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'cpu_count': os.cpu_count(),
+		'numpy': np.__version__,
+	}
+
+	try:
+		import subprocess
+		meta['git_commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_FOLDER, capture_output=True, text=True).stdout.strip()
+	except OSError:
+		meta['git_commit'] = None
+
+	return meta
+
+# generates a synthetic stats folder in work_folder and times the hot paths of the report generation
+# f_log is called with a line of text after every benchmark
+# returns the results as a json serializable dict
+def run_benchmarks(work_folder, scenarios_n = 40, runs_n = 200, years_n = 1, repeats = 3, plots_n = 5, f_log = None):
+	if f_log is None:
+		f_log = lambda line: None
+
+	params = {'scenarios_n': scenarios_n, 'runs_n': runs_n, 'years_n': years_n, 'repeats': repeats, 'plots_n': plots_n}
+	results = dict()
+
+	# items_n: if given, the median cost per item (ex: per stat file) is added to the results
+	def bench(name, f, setup = None, repeats = repeats, items_n = None):
+		results[name] = time_call(f, repeats, setup)
+		line = f'{name:<24} min {results[name]["min"]*1000:10.1f} ms    median {results[name]["median"]*1000:10.1f} ms'
+		if items_n is not None and items_n > 0:
+			results[name]['per_item_us'] = results[name]['median'] / items_n * 1e6
+			line += f'    {results[name]["per_item_us"]:8.1f} us/item'
+		f_log(line)
+
+	# synthetic data
+	kovaaks_folder = os.path.join(work_folder, 'kovaaks')
+	t0 = time.perf_counter()
+	scen_paths = generate_kovaaks_folder(kovaaks_folder, scenarios_n, runs_n, years_n)
+	f_log(f'generated {len(scen_paths)} stat files in {time.perf_counter() - t0:.1f} s')
+
+	cfg = make_config(work_folder, kovaaks_folder)
+	stats_folder = cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS)
+	stats_cache_path = os.path.join(work_folder, STATS_CACHE_FILENAME)
+	chart_cache_path = os.path.join(work_folder, CHART_CACHE_FOLDERNAME)
+	reports_path = cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS)
+
+	def clear_stats_cache():
+		if os.path.exists(stats_cache_path):
+			os.remove(stats_cache_path)
+
+	def clear_chart_cache():
+		shutil.rmtree(chart_cache_path, ignore_errors=True)
+
+	def clear_reports():
+		shutil.rmtree(reports_path, ignore_errors=True)
+		os.makedirs(reports_path)
+
+	# listing and parsing
+	bench('list_folder', lambda: StatsIndex(stats_folder))
+	bench('parse_legacy', lambda: [Scenario(scen_path) for scen_path in scen_paths], items_n=len(scen_paths))
+	bench('parse_fast', lambda: [read_summary(scen_path) for scen_path in scen_paths], items_n=len(scen_paths))
+	bench('parse_serial', lambda: parse_stat_files(scen_paths, max_workers=1), items_n=len(scen_paths))
+	bench('parse_pool', lambda: parse_stat_files(scen_paths), items_n=len(scen_paths))
+
+	# stats cache
+	index = StatsIndex(stats_folder)
+	paths_by_name = {name: index.get_paths(name) for name in index.get_names()}
+	bench('cache_sync_cold', lambda: StatsCache(stats_cache_path).sync(index), setup=clear_stats_cache)
+	bench('cache_load_warm', lambda: StatsCache(stats_cache_path).get_histories(index, paths_by_name))
+
+	# grouping and averaging
+	histories = list(StatsCache(stats_cache_path).get_histories(index, paths_by_name).values())
+	bench('group_sessions', lambda: [history.group_sessions(6, MERGE_MIN, MERGE_MIN, MERGE_AVERAGE) for history in histories])
+
+	report = Report(None, cfg)
+	scores = [history.get_target(TARGET_SCORE) for history in histories]
+	for mode in ckeys.SMOOTHING_MODES:
+		bench(f'average_{mode}', lambda mode=mode: [report.make_averaged_data(data_y, 5, mode) for data_y in scores])
+
+	# plotting, a few charts rendered serially
+	report.resources_folder_path = tempfile.mkdtemp(dir=work_folder)
+	chart_jobs = []
+	for history in histories[:plots_n]:
+		section = report.make_section_data(history.get_name(), history)
+		if section is not None:
+			chart_jobs.append(section['chart_job'])
+	bench('plot', lambda: [charts.render_chart(job) for job in chart_jobs])
+
+	# full report, with empty caches (first run) and warm caches (nothing new played)
+	playlist = [p for p in Playlist.get_kovaaks_playlists(cfg.get_path(ckeys.PATHKEY_KOVAAKS_PLAYLISTS)) if p.name == SYNTHETIC_PLAYLIST_NAME][0]
+	def generate_report():
+		report = Report(playlist, cfg)
+		report.write_report(report.generate_report())
+		report.write_css(report.generate_css())
+
+	def clear_all():
+		clear_stats_cache()
+		clear_chart_cache()
+		clear_reports()
+
+	bench('report_cold', generate_report, setup=clear_all)
+	bench('report_warm', generate_report, setup=clear_reports)
+
+	return {
+		'version': BENCHMARK_RESULTS_VERSION,
+		'created_at': datetime.now().isoformat(),
+		'meta': get_meta(),
+		'params': params,
+		'stat_files_n': len(scen_paths),
+		'results': results,
+	}
+
+# prints the median of every benchmark against a previous results file
+def print_comparison(results, previous):
+	print(f'{"benchmark":<24} {"previous":>12} {"current":>12} {"ratio":>8}')
+	for name, current in results['results'].items():
+		before = previous['results'].get(name)
+		if before is None:
+			print(f'{name:<24} {"-":>12} {current["median"]*1000:10.1f}ms {"-":>8}')
+			continue
+
+		ratio = current['median'] / before['median'] if before['median'] > 0 else float('inf')
+		print(f'{name:<24} {before["median"]*1000:10.1f}ms {current["median"]*1000:10.1f}ms {ratio:7.2f}x')
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(prog='benchmarks', description='Benchmarks the report generation on a synthetic KovaaK\'s stats folder.')
+	parser.add_argument('--scenarios', type=int, default=40, help='number of scenarios')
+	parser.add_argument('--runs', type=int, default=200, help='runs per scenario')
+	parser.add_argument('--years', type=float, default=1, help='years the runs are spread over')
+	parser.add_argument('--repeats', type=int, default=3, help='timed repeats of every benchmark')
+	parser.add_argument('--plots', type=int, default=5, help='charts rendered by the plot benchmark')
+	parser.add_argument('--output', default=f'benchmark_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json', help='results json file')
+	parser.add_argument('--compare', help='previous results json file to compare against')
+	parser.add_argument('--work-folder', help='folder for the synthetic data, a temporary folder is used and removed by default')
+	args = parser.parse_args(argv)
+
+	work_folder = args.work_folder if args.work_folder is not None else tempfile.mkdtemp(prefix='ksv_benchmark_')
+	os.makedirs(work_folder, exist_ok=True)
+
+	try:
+		results = run_benchmarks(work_folder, args.scenarios, args.runs, args.years, args.repeats, args.plots, f_log=print)
+	finally:
+		if args.work_folder is None:
+			shutil.rmtree(work_folder, ignore_errors=True)
+
+	with open(args.output, 'w') as fp:
+		json.dump(results, fp, indent=4)
+	print(f'results written to {args.output}')
+
+	if args.compare is not None:
+		with open(args.compare, 'r') as fp:
+			previous = json.load(fp)
+		print_comparison(results, previous)
+
+	return 0
@@ -1,9 +1,9 @@
 import os
-from random import uniform
-from re import T
-from sys import maxsize
-from turtle import back
+import time
+import importlib
 import webbrowser
+import threading
+import queue
 
 import tkinter as tk
 from tkinter import ttk
@@ -18,22 +18,40 @@ from gui.confirmbox import KSVConfirmBox
 from gui.messagebox import KSVMessageBox
 from gui.window_createplaylist import CreatePlaylistWindow
 from gui.window_promptkovaaksfolder import BrowseKovaaksFolder
-from models.report import Report
+from util.exceptions import ReportCancelledException
+import util.utilities as utilities
+from util.version import VersionChecker, VERSION_CACHE_FILENAME
 
 BANNER_REGULAR_FILENAME = 'banner_regular.png'
 BANNER_HOVER_FILENAME = 'banner_hover.png'
 ICON_ERROR_FILENAME = 'icon_error.png'
 ICON_QUESTION_FILENAME = 'icon_question.png'
 
+# ms between checks of the report worker queue
+REPORT_POLL_INTERVAL = 100
+
+# ms between checks of the version check result
+VERSION_POLL_INTERVAL = 250
+
+# ms between checks of the stats watcher queue
+WATCHER_POLL_INTERVAL = 1000
+
+# the analytics and rendering stack is imported in the background once the window is shown,
+# in this order so the startup timing shows the cost of each one
+PREWARM_MODULES = ['numpy', 'scipy.interpolate', 'matplotlib.figure', 'yattag', 'cssmin', 'models.report']
+
 # main window
 class MainWindow(tk.Tk):
-    def __init__(self, cfg: Config):
+    # startup_time: time.perf_counter() at process start, if given a startup timing summary is printed
+    def __init__(self, cfg: Config, startup_time = None):
         super().__init__()
 
         self.cfg = cfg
+        self.startup_time = startup_time
 
         self.deiconify()
         self.title('KovaaK\'s Stat Visualizer')
+        self.protocol('WM_DELETE_WINDOW', self.event_close)
         self.columnconfigure(0, weight=1, minsize=0)
         self.rowconfigure(0, weight=1, minsize=0)
 
@@ -48,6 +66,11 @@ class MainWindow(tk.Tk):
         self.var_option_days_number = tk.StringVar(value=self.cfg.get_option(ckeys.OPTIONKEY_DAYS_NUMBER))
         self.var_option_average_check = tk.BooleanVar(value=self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK))
         self.var_option_percentage_check = tk.BooleanVar(value=self.cfg.get_option(ckeys.OPTIONKEY_PERCENTAGES_CHECK))
+        self.var_option_smoothing_mode = tk.StringVar(value=self.cfg.get_option(ckeys.OPTIONKEY_SMOOTHING_MODE))
+        self.var_option_downsample_mode = tk.StringVar(value=self.cfg.get_option(ckeys.OPTIONKEY_DOWNSAMPLE_MODE))
+        self.var_option_deep_parse_check = tk.BooleanVar(value=self.cfg.get_option(ckeys.OPTIONKEY_DEEP_PARSE_CHECK))
+        self.var_option_sens_check = tk.BooleanVar(value=self.cfg.get_option(ckeys.OPTIONKEY_SENS_CHECK))
+        self.var_option_update_in_place_check = tk.BooleanVar(value=self.cfg.get_option(ckeys.OPTIONKEY_UPDATE_IN_PLACE_CHECK))
         
         self.var_option_group_sessions_number.trace_add('write', self.f_command_option_group_sessions_number)
         self.var_option_days_number.trace_add('write', self.f_command_option_days_number)
@@ -55,10 +78,36 @@ class MainWindow(tk.Tk):
         self.playlist_listbox = None
         self.banner_regular = None
         self.banner_hover = None
+
+        # report generation runs on a worker thread, it reports back through this queue
+        self.report_queue = queue.Queue()
+        self.report_thread = None
+        self.report_cancel_event = None
+        self.report_auto_refresh = False
+        self.report_new_runs = False
+        self.var_report_progress = tk.DoubleVar(value=0)
+        self.var_report_status = tk.StringVar(value='')
+
+        # the remote version check runs in the background once the window is shown
+        self.version_queue = queue.Queue()
+
+        # once the stats cache is synced, the stats folder is watched for new runs
+        # the watcher keeps the shared index up to date and reports the scenarios with new runs through this queue
+        self.stats_index = None
+        self.stats_watcher = None
+        # set once the background sync is done, reports wait on it so cache misses are not parsed twice
+        self.stats_synced = threading.Event()
+        # the watcher is started again on the new folder when the kovaaks folder changes
+        self.stats_folder = None
+        self.stats_lock = threading.Lock()
+        self.watcher_queue = queue.Queue()
+        self.new_runs_names = set()
         
         # widget init
         self.create_widgets()
-        self.alert_version()
+        self.after_idle(self.start_version_check)
+        self.after_idle(self.start_prewarm)
+        self.after(WATCHER_POLL_INTERVAL, self.poll_watcher_queue)
 
     # main application window
     def create_widgets(self):
@@ -171,17 +220,72 @@ class MainWindow(tk.Tk):
         frame_option_percentages.grid(row=4, column=0, sticky='news')
         self.checkbox_option_percentages.grid(row=0, column=0, sticky='nsw')
 
+        # option 6: average smoothing mode
+        frame_option_smoothing = ttk.Frame(frame_options)
+        label_option_smoothing = ttk.Label(frame_option_smoothing, text='Average mode')
+        state = 'readonly' if self.var_option_average_check.get() else 'disabled'
+        self.combobox_option_smoothing = ttk.Combobox(frame_option_smoothing, width=8, textvariable=self.var_option_smoothing_mode, values=ckeys.SMOOTHING_MODES, state=state)
+        self.combobox_option_smoothing.bind('<<ComboboxSelected>>', self.f_command_option_smoothing_mode)
+
+        frame_option_smoothing.grid(row=5, column=0, sticky='news')
+        label_option_smoothing.grid(row=0, column=0, sticky='nsw', padx=(20, 5))
+        self.combobox_option_smoothing.grid(row=0, column=1, sticky='nsw')
+
+        # option 7: downsampling of dense charts
+        frame_option_downsample = ttk.Frame(frame_options)
+        label_option_downsample = ttk.Label(frame_option_downsample, text='Chart downsampling')
+        self.combobox_option_downsample = ttk.Combobox(frame_option_downsample, width=8, textvariable=self.var_option_downsample_mode, values=ckeys.DOWNSAMPLE_MODES, state='readonly')
+        self.combobox_option_downsample.bind('<<ComboboxSelected>>', self.f_command_option_downsample_mode)
+
+        frame_option_downsample.grid(row=6, column=0, sticky='news')
+        label_option_downsample.grid(row=0, column=0, sticky='nsw', padx=(0, 5))
+        self.combobox_option_downsample.grid(row=0, column=1, sticky='nsw')
+
+        # option 8: kill events and weapons (deep parse)
+        frame_option_deep_parse = ttk.Frame(frame_options)
+        checkbox_option_deep_parse = ttk.Checkbutton(frame_option_deep_parse, text='Display kill and weapon stats (slower first parse)', variable=self.var_option_deep_parse_check, command=self.f_command_option_deep_parse_check)
+        frame_option_deep_parse.grid(row=7, column=0, sticky='news')
+        checkbox_option_deep_parse.grid(row=0, column=0, sticky='nsw')
+
+        # option 9: scores per sensitivity
+        frame_option_sens = ttk.Frame(frame_options)
+        checkbox_option_sens = ttk.Checkbutton(frame_option_sens, text='Display scores per sensitivity', variable=self.var_option_sens_check, command=self.f_command_option_sens_check)
+        frame_option_sens.grid(row=8, column=0, sticky='news')
+        checkbox_option_sens.grid(row=0, column=0, sticky='nsw')
+
+        # option 10: update the playlist report in place
+        frame_option_update_in_place = ttk.Frame(frame_options)
+        checkbox_option_update_in_place = ttk.Checkbutton(frame_option_update_in_place, text='Update report in place (auto refresh on new runs)', variable=self.var_option_update_in_place_check, command=self.f_command_option_update_in_place_check)
+        frame_option_update_in_place.grid(row=9, column=0, sticky='news')
+        checkbox_option_update_in_place.grid(row=0, column=0, sticky='nsw')
+
         # option (last): browse kovaaks folder
         button_browse_folder = ttk.Button(frame_options, text='Change KovaaK\'s folder', command=self.command_browse_kovaaks_folder)
-        button_browse_folder.grid(row=5, column=0, sticky='ns', pady=(5, 5))
+        button_browse_folder.grid(row=10, column=0, sticky='ns', pady=(5, 5))
 
         # after adding all children to options: add padding
         for frame_child in frame_options.winfo_children():
             frame_child.grid_configure(padx=(5, 5), pady=(2, 0))
 
-        # right frame: generate button
-        button_generate = ttk.Button(frame_right, text='Generate report', command=self.command_generate_report)
-        button_generate.grid(row=2, column=0, sticky='news', padx=(50, 50))
+        # right frame: generate button and report progress
+        frame_generate = ttk.Frame(frame_right)
+        frame_generate.grid(row=2, column=0, sticky='news', padx=(50, 50))
+        frame_generate.columnconfigure(0, weight=1)
+
+        self.button_generate = ttk.Button(frame_generate, text='Generate report', command=self.command_generate_report)
+        self.button_generate.grid(row=0, column=0, sticky='news')
+
+        self.button_dashboard = ttk.Button(frame_generate, text='Dashboard', command=self.command_generate_dashboard)
+        self.button_dashboard.grid(row=0, column=1, sticky='news', padx=(5, 0))
+
+        self.progressbar_report = ttk.Progressbar(frame_generate, orient=tk.HORIZONTAL, mode='determinate', maximum=1, variable=self.var_report_progress)
+        self.progressbar_report.grid(row=1, column=0, sticky='ew', pady=(5, 0))
+
+        self.button_cancel_report = ttk.Button(frame_generate, text='Cancel', command=self.command_cancel_report, state='disabled')
+        self.button_cancel_report.grid(row=1, column=1, sticky='e', padx=(5, 0), pady=(5, 0))
+
+        label_report_status = ttk.Label(frame_generate, textvariable=self.var_report_status)
+        label_report_status.grid(row=2, column=0, columnspan=2, sticky='w')
 
         # right frame: banner
         self.banner_label = ttk.Label(frame_right, cursor='hand2')
@@ -207,6 +311,105 @@ class MainWindow(tk.Tk):
             ttk.Label(self.frame_playlist_info, text=scenario_name).grid(row=i, column=1, sticky='w')
             i += 1
 
+    # loads the heavy modules and validates the stats cache in the background, so the first report starts faster
+    def start_prewarm(self):
+        if self.startup_time is not None:
+            print(f'[timing] time to first window: {(time.perf_counter() - self.startup_time)*1000:.0f} ms')
+
+        self.stats_folder = self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS)
+        threading.Thread(target=self.run_prewarm, daemon=True).start()
+
+    # runs on a worker thread, never touches tk widgets
+    def run_prewarm(self):
+        try:
+            for module_name in PREWARM_MODULES:
+                t0 = time.perf_counter()
+                importlib.import_module(module_name)
+                if self.startup_time is not None:
+                    print(f'[timing] import {module_name}: {(time.perf_counter() - t0)*1000:.0f} ms')
+        finally:
+            # reports wait on the sync, so it runs even if an import failed
+            self.run_stats_sync()
+
+    # syncs the stats cache with the configured stats folder in the background, then watches it
+    def start_stats_sync(self):
+        self.stats_folder = self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS)
+        self.stats_synced.clear()
+        threading.Thread(target=self.run_stats_sync, daemon=True).start()
+
+    # runs on a worker thread, never touches tk widgets
+    # the watcher of a previous stats folder is stopped first
+    def run_stats_sync(self):
+        with self.stats_lock:
+            try:
+                # only new or modified stat files are parsed
+                stats_folder = self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS)
+                if self.stats_watcher is not None:
+                    if self.stats_index.stats_folder == stats_folder:
+                        return
+
+                    self.stats_watcher.stop()
+                    self.stats_watcher = None
+                    self.stats_index = None
+
+                if stats_folder is not None and os.path.isdir(stats_folder):
+                    from models.statsindex import StatsIndex
+                    from models.statscache import StatsCache
+                    from models.watcher import StatsWatcher
+
+                    t0 = time.perf_counter()
+                    stats_index = StatsIndex(stats_folder)
+                    stats_cache = StatsCache.from_config(self.cfg)
+                    n_parsed = stats_cache.sync(stats_index)
+                    if self.startup_time is not None:
+                        print(f'[timing] stats cache sync ({n_parsed} files parsed): {(time.perf_counter() - t0)*1000:.0f} ms')
+
+                    self.stats_watcher = StatsWatcher(stats_index, stats_cache, self.watcher_queue.put)
+                    self.stats_watcher.start()
+                    self.stats_index = stats_index
+            finally:
+                # reports never wait forever, even if the sync failed
+                self.stats_synced.set()
+
+    # collects the scenarios with new runs found by the stats watcher
+    def poll_watcher_queue(self):
+        names = set()
+        while not self.watcher_queue.empty():
+            names.update(self.watcher_queue.get_nowait())
+
+        if len(names) > 0:
+            self.event_new_runs(names)
+
+        self.after(WATCHER_POLL_INTERVAL, self.poll_watcher_queue)
+
+    def start_version_check(self):
+        threading.Thread(target=self.run_version_check, daemon=True).start()
+        self.after(VERSION_POLL_INTERVAL, self.poll_version_queue)
+
+    # runs on a worker thread, never touches tk widgets
+    # puts (outdated, misscheck) in the version queue
+    def run_version_check(self):
+        try:
+            version_local = VersionChecker()
+            version_local.load_local_version()
+
+            version_remote = VersionChecker()
+            version_remote.load_remote_version_cached(os.path.join(os.path.dirname(self.cfg.cfg_path), VERSION_CACHE_FILENAME))
+
+            self.version_queue.put((version_local.compare_versions(version_remote) < 0, False))
+        except Exception as e:
+            self.version_queue.put((False, True))
+
+    def poll_version_queue(self):
+        if self.version_queue.empty():
+            self.after(VERSION_POLL_INTERVAL, self.poll_version_queue)
+            return
+
+        outdated, misscheck = self.version_queue.get_nowait()
+        self.cfg.set_app(ckeys.APPKEY_VERSION_OUTDATED, outdated)
+        self.cfg.set_app(ckeys.APPKEY_VERSION_MISSCHECK, misscheck)
+        self.alert_version()
+
     def alert_version(self):
         if self.cfg.get_app(ckeys.APPKEY_VERSION_OUTDATED):
             KSVMessageBox(
@@ -270,6 +473,7 @@ class MainWindow(tk.Tk):
     def command_browse_kovaaks_folder(self, *args):
         icon_error_path = os.path.join(self.cfg.get_path(ckeys.PATHKEY_LOCAL_RESOURCES), ICON_ERROR_FILENAME)
         window = BrowseKovaaksFolder(self.cfg, icon_error_path)
+        window.bind('<Destroy>', self.event_kovaaks_folder_changed)
         window.mainloop()
 
     # option commands
@@ -312,14 +516,37 @@ class MainWindow(tk.Tk):
         state = 'enabled' if self.var_option_average_check.get() else 'disabled'
         self.checkbox_option_percentages.config(state=state)
 
+        state = 'readonly' if self.var_option_average_check.get() else 'disabled'
+        self.combobox_option_smoothing.config(state=state)
 
     # option: display percentages vs average
     def f_command_option_percentage_check(self, *args):
         self.cfg.set_option(ckeys.OPTIONKEY_PERCENTAGES_CHECK, self.var_option_percentage_check.get())
 
+    # option: average smoothing mode
+    def f_command_option_smoothing_mode(self, *args):
+        self.cfg.set_option(ckeys.OPTIONKEY_SMOOTHING_MODE, self.var_option_smoothing_mode.get())
+
+    # option: downsampling mode
+    def f_command_option_downsample_mode(self, *args):
+        self.cfg.set_option(ckeys.OPTIONKEY_DOWNSAMPLE_MODE, self.var_option_downsample_mode.get())
+
+    # option: deep parse
+    def f_command_option_deep_parse_check(self, *args):
+        self.cfg.set_option(ckeys.OPTIONKEY_DEEP_PARSE_CHECK, self.var_option_deep_parse_check.get())
+
+    # option: sens stats
+    def f_command_option_sens_check(self, *args):
+        self.cfg.set_option(ckeys.OPTIONKEY_SENS_CHECK, self.var_option_sens_check.get())
+
+    # option: update report in place
+    def f_command_option_update_in_place_check(self, *args):
+        self.cfg.set_option(ckeys.OPTIONKEY_UPDATE_IN_PLACE_CHECK, self.var_option_update_in_place_check.get())
+
 
     # generate commands
-    def command_generate_report(self, *args):
+    # auto_refresh: the report is updated because of new runs, the browser is not opened again
+    def command_generate_report(self, *args, auto_refresh = False):
         c1 = self.selected_playlist is not None
         
         if self.cfg.get_option(ckeys.OPTIONKEY_GROUP_SESSIONS_CHECK):
@@ -338,19 +565,124 @@ class MainWindow(tk.Tk):
         else:
             c3 = True
 
-        conditions = c1 and c2 and c3
+        conditions = c1 and c2 and c3 and self.report_thread is None
         if conditions:
-            report = Report(self.selected_playlist, self.cfg)
-            report_content = report.generate_report()
+            self.start_report(self.selected_playlist, auto_refresh)
+        else:
+            self.bell()
+
+    # the dashboard covers every scenario, it does not need a selected playlist
+    def command_generate_dashboard(self, *args):
+        if self.report_thread is None:
+            self.start_report(None)
+        else:
+            self.bell()
+
+    # starts the report worker, the dashboard is generated if playlist is None
+    def start_report(self, playlist, auto_refresh = False):
+        self.report_cancel_event = threading.Event()
+        self.report_auto_refresh = auto_refresh
+        self.report_thread = threading.Thread(target=self.run_report, args=(playlist, self.report_cancel_event), daemon=True)
+
+        self.button_generate.config(state='disabled')
+        self.button_dashboard.config(state='disabled')
+        self.button_cancel_report.config(state='enabled')
+        self.var_report_progress.set(0)
+        self.var_report_status.set('Starting...')
+        # only the runs of the reported scenarios are covered, the dashboard covers every scenario
+        if playlist is not None:
+            self.new_runs_names -= set(playlist.scenarios_names)
+        else:
+            self.new_runs_names = set()
+
+        self.report_thread.start()
+        self.after(REPORT_POLL_INTERVAL, self.poll_report_queue)
+
+    def command_cancel_report(self, *args):
+        if self.report_cancel_event is not None:
+            self.report_cancel_event.set()
+            self.button_cancel_report.config(state='disabled')
+            self.var_report_status.set('Cancelling...')
+
+    # runs on the report worker thread, never touches tk widgets
+    # playlist: the playlist to report, or None for the dashboard of every scenario
+    def run_report(self, playlist, cancel_event):
+        f_progress = lambda done, total, stage_text: self.report_queue.put(('progress', done, total, stage_text))
+
+        try:
+            # imported here, the analytics stack is not needed to show the window
+            from models.report import Report
+            from models.dashboard import Dashboard
+
+            # a report started during the first sync waits for it instead of parsing the same files
+            while not self.stats_synced.wait(REPORT_POLL_INTERVAL / 1000):
+                utilities.check_cancelled(cancel_event)
+
+            # the watched index is already up to date, no need to list the stats folder again
+            stats_index = self.stats_index
+            if stats_index is not None and stats_index.stats_folder != self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS):
+                stats_index = None
+
+            if playlist is not None:
+                report = Report(playlist, self.cfg, stats_index=stats_index)
+            else:
+                report = Dashboard(self.cfg, stats_index=stats_index)
+            report_content = report.generate_report(f_progress, cancel_event)
             report_path = report.write_report(report_content)
 
             css_content = report.generate_css()
             report.write_css(css_content)
-
-            if self.cfg.get_option(ckeys.OPTIONKEY_AUTO_OPEN_CHECK):
-                webbrowser.open(report_path, new=2)
+            report.write_timing_log()
+
+            self.report_queue.put(('done', report_path))
+        except ReportCancelledException:
+            self.report_queue.put(('cancelled',))
+        except Exception as e:
+            self.report_queue.put(('error', str(e)))
+
+    def poll_report_queue(self):
+        finished = False
+        while not self.report_queue.empty():
+            message = self.report_queue.get_nowait()
+
+            if message[0] == 'progress':
+                _, done, total, stage_text = message
+                self.var_report_progress.set(done/total if total > 0 else 0)
+                self.var_report_status.set(f'{stage_text} ({done}/{total})')
+            elif message[0] == 'done':
+                finished = True
+                self.var_report_progress.set(1)
+                self.var_report_status.set('Report generated')
+                if self.cfg.get_option(ckeys.OPTIONKEY_AUTO_OPEN_CHECK) and not self.report_auto_refresh:
+                    webbrowser.open(message[1], new=2)
+            elif message[0] == 'cancelled':
+                finished = True
+                self.var_report_progress.set(0)
+                self.var_report_status.set('Report cancelled')
+            elif message[0] == 'error':
+                finished = True
+                self.var_report_progress.set(0)
+                self.var_report_status.set('')
+                KSVMessageBox(
+                    parent=self,
+                    title='Report error',
+                    message=f'The report could not be generated:\n{message[1]}',
+                    icon_path=os.path.join(self.cfg.get_path(ckeys.PATHKEY_LOCAL_RESOURCES), ICON_ERROR_FILENAME)
+                )
+
+        if finished:
+            self.report_thread = None
+            self.report_cancel_event = None
+            self.button_generate.config(state='enabled')
+            self.button_dashboard.config(state='enabled')
+            self.button_cancel_report.config(state='disabled')
+
+            # runs found while the report was generated
+            if self.report_new_runs:
+                self.report_new_runs = False
+                self.event_new_runs(set())
         else:
-            self.bell()
+            self.after(REPORT_POLL_INTERVAL, self.poll_report_queue)
 
     # events
     def event_listbox_playlist_selection(self, *args):
@@ -358,6 +690,40 @@ class MainWindow(tk.Tk):
         self.selected_playlist = self.playlists[i]
         self.update_scenarios()
 
+    # called with the scenarios that got new runs since the last check
+    # in update in place mode, the report of the selected playlist is refreshed when one of its scenarios got new runs
+    def event_new_runs(self, scenarios_names):
+        self.new_runs_names.update(scenarios_names)
+
+        # checked again once the report is done
+        if self.report_thread is not None:
+            self.report_new_runs = True
+            return
+
+        auto_refresh = (self.cfg.get_option(ckeys.OPTIONKEY_UPDATE_IN_PLACE_CHECK)
+            and self.selected_playlist is not None
+            and not self.new_runs_names.isdisjoint(self.selected_playlist.scenarios_names))
+
+        if auto_refresh:
+            self.command_generate_report(auto_refresh=True)
+        else:
+            self.var_report_status.set(f'New runs: {len(self.new_runs_names)} scenario(s) updated')
+
+    # the new stats folder is synced and watched, the new runs of the previous one are dropped
+    def event_kovaaks_folder_changed(self, *args):
+        if self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS) == self.stats_folder:
+            return
+
+        self.new_runs_names = set()
+        self.start_stats_sync()
+
+    def event_close(self, *args):
+        if self.stats_watcher is not None:
+            self.stats_watcher.stop()
+
+        self.cfg.flush()
+        self.destroy()
+
     def event_banner_enter(self, *args):
         self.banner_label.image = self.banner_hover
         self.banner_label.configure(image=self.banner_hover)
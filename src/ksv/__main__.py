@@ -0,0 +1,7 @@
+import sys
+
+from ksv.cli import main
+
+# execution: python -m ksv <command> [options], from the src folder
+if __name__ == '__main__':
+    sys.exit(main())
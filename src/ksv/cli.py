@@ -0,0 +1,250 @@
+import os
+import sys
+import argparse
+
+from models.config import Config
+import models.config as ckeys
+from models.config import CONFIG_FILENAME
+from models.playlist import Playlist
+
+# headless command line, never imports tkinter so it can run without a display (ex: from cron)
+# python -m ksv report --playlist NAME [--playlist NAME2 ...] --days 30 --group-hours 6
+
+SRC_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCAL_RESOURCES_FOLDERNAME = 'resources'
+LOCAL_PLAYLIST_FOLDERNAME = 'playlists'
+LOCAL_REPORTS_FOLDERNAME = 'reports'
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+
+# argparse type of the options that only accept positive numbers
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f'{value} is not a positive number')
+    return number
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='ksv', description='KovaaK\'s Stat Visualizer, headless commands.')
+    parser.add_argument('--config', default=os.path.join(SRC_FOLDER, CONFIG_FILENAME), help='config file to read (never written), defaults to the one of the application')
+    parser.add_argument('--kovaaks-folder', help='KovaaK\'s install folder, overrides the configured one')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # report command
+    parser_report = subparsers.add_parser('report', help='generate playlist reports')
+    parser_report.add_argument('--playlist', action='append', default=[], metavar='NAME', help='playlist to report, can be repeated')
+    parser_report.add_argument('--all-playlists', action='store_true', help='report every playlist')
+
+    group_days = parser_report.add_mutually_exclusive_group()
+    group_days.add_argument('--days', type=positive_int, metavar='N', help='only analyze the last N days')
+    group_days.add_argument('--all-days', action='store_true', help='analyze every run')
+
+    group_sessions = parser_report.add_mutually_exclusive_group()
+    group_sessions.add_argument('--group-hours', type=positive_int, metavar='H', help='group sessions by H hours')
+    group_sessions.add_argument('--no-group', action='store_true', help='do not group sessions')
+
+    parser_report.add_argument('--smoothing', choices=ckeys.SMOOTHING_MODES, help='average smoothing mode')
+    parser_report.add_argument('--downsample', choices=ckeys.DOWNSAMPLE_MODES, help='downsampling of dense charts')
+    parser_report.add_argument('--downsample-points', type=positive_int, metavar='N', help='max number of points of a chart when downsampling')
+    parser_report.add_argument('--no-average', action='store_true', help='do not display average data')
+    parser_report.add_argument('--no-percentages', action='store_true', help='do not display percentages vs average')
+    parser_report.add_argument('--deep-parse', action='store_true', help='add the kill and weapon stats to every scenario, the first parse of every file is slower')
+    parser_report.add_argument('--sens-stats', action='store_true', help='add the scores per sensitivity bucket to every scenario')
+    parser_report.add_argument('--sens-bucket', type=positive_int, metavar='CM', help='width of the sensitivity buckets, in cm/360')
+    parser_report.add_argument('--mouse-dpi', type=positive_int, metavar='DPI', help='mouse dpi, converts the game sens scales to cm/360')
+    parser_report.add_argument('--in-place', action='store_true', help='update the stable report folder of each playlist')
+    parser_report.add_argument('--reports-folder', help='folder where reports are written, overrides the configured one')
+    parser_report.add_argument('--quiet', action='store_true', help='do not print progress')
+    parser_report.add_argument('--timing', action='store_true', help='time the generation stages, the summary is printed and written to timing.log')
+    parser_report.add_argument('--timing-in-report', action='store_true', help='also add the timing summary to the report, as a collapsible section')
+    parser_report.add_argument('--profile', action='store_true', help='profile the generation with cProfile, written to profile.prof and profile.txt')
+
+    # dashboard command
+    parser_dashboard = subparsers.add_parser('dashboard', help='generate the dashboard of every scenario')
+    parser_dashboard.add_argument('--in-place', action='store_true', help='update the stable dashboard folder')
+    parser_dashboard.add_argument('--reports-folder', help='folder where reports are written, overrides the configured one')
+    parser_dashboard.add_argument('--quiet', action='store_true', help='do not print progress')
+    parser_dashboard.add_argument('--timing', action='store_true', help='time the generation stages, the summary is printed and written to timing.log')
+    parser_dashboard.add_argument('--profile', action='store_true', help='profile the generation with cProfile, written to profile.prof and profile.txt')
+
+    # playlists command
+    subparsers.add_parser('playlists', help='list the avaliable playlists')
+
+    return parser
+
+# loads the config without ever saving it, command line overrides are not persisted
+def load_config(args):
+    if not os.path.isfile(args.config):
+        raise FileNotFoundError(f'Config file not found: {args.config}')
+
+    cfg = Config(args.config, autosave=False)
+    if cfg.get_path(ckeys.PATHKEY_LOCAL_RESOURCES) is None:
+        cfg.set_path(ckeys.PATHKEY_LOCAL_RESOURCES, os.path.join(SRC_FOLDER, LOCAL_RESOURCES_FOLDERNAME))
+    if cfg.get_path(ckeys.PATHKEY_LOCAL_PLAYLISTS) is None:
+        cfg.set_path(ckeys.PATHKEY_LOCAL_PLAYLISTS, os.path.join(SRC_FOLDER, LOCAL_PLAYLIST_FOLDERNAME))
+    if cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS) is None:
+        cfg.set_path(ckeys.PATHKEY_LOCAL_REPORTS, os.path.join(SRC_FOLDER, LOCAL_REPORTS_FOLDERNAME))
+
+    if args.kovaaks_folder is not None:
+        cfg.set_path(ckeys.PATHKEY_KOVAAKS_FOLDER, os.path.abspath(args.kovaaks_folder))
+    if cfg.get_path(ckeys.PATHKEY_KOVAAKS_FOLDER) is None:
+        raise ValueError('KovaaK\'s folder not set, use --kovaaks-folder')
+
+    return cfg
+
+def load_playlists(cfg):
+    playlists = Playlist.get_kovaaks_playlists(cfg.get_path(ckeys.PATHKEY_KOVAAKS_PLAYLISTS))
+    if os.path.isdir(cfg.get_path(ckeys.PATHKEY_LOCAL_PLAYLISTS)):
+        playlists += Playlist.get_local_playlists(cfg.get_path(ckeys.PATHKEY_LOCAL_PLAYLISTS))
+
+    playlists.sort(key=lambda p: p.name)
+    return playlists
+
+# returns the playlists matching the given names (case insensitive), in the given order
+def select_playlists(playlists, names):
+    selected = []
+    for name in names:
+        matches = [p for p in playlists if p.name.lower() == name.lower()]
+        if len(matches) == 0:
+            raise ValueError(f'Playlist not found: {name}')
+
+        selected.extend(p for p in matches if p not in selected)
+
+    return selected
+
+def apply_report_options(cfg, args):
+    if args.days is not None:
+        cfg.set_option(ckeys.OPTIONKEY_DAYS_CHECK, True)
+        cfg.set_option(ckeys.OPTIONKEY_DAYS_NUMBER, args.days)
+    elif args.all_days:
+        cfg.set_option(ckeys.OPTIONKEY_DAYS_CHECK, False)
+
+    if args.group_hours is not None:
+        cfg.set_option(ckeys.OPTIONKEY_GROUP_SESSIONS_CHECK, True)
+        cfg.set_option(ckeys.OPTIONKEY_GROUP_SESSIONS_NUMBER, args.group_hours)
+    elif args.no_group:
+        cfg.set_option(ckeys.OPTIONKEY_GROUP_SESSIONS_CHECK, False)
+
+    if args.smoothing is not None:
+        cfg.set_option(ckeys.OPTIONKEY_SMOOTHING_MODE, args.smoothing)
+    if args.downsample is not None:
+        cfg.set_option(ckeys.OPTIONKEY_DOWNSAMPLE_MODE, args.downsample)
+    if args.downsample_points is not None:
+        cfg.set_option(ckeys.OPTIONKEY_DOWNSAMPLE_NUMBER, args.downsample_points)
+    if args.no_average:
+        cfg.set_option(ckeys.OPTIONKEY_AVERAGE_CHECK, False)
+    if args.no_percentages:
+        cfg.set_option(ckeys.OPTIONKEY_PERCENTAGES_CHECK, False)
+    if args.deep_parse:
+        cfg.set_option(ckeys.OPTIONKEY_DEEP_PARSE_CHECK, True)
+    if args.sens_stats:
+        cfg.set_option(ckeys.OPTIONKEY_SENS_CHECK, True)
+    if args.sens_bucket is not None:
+        cfg.set_option(ckeys.OPTIONKEY_SENS_BUCKET_NUMBER, args.sens_bucket)
+    if args.mouse_dpi is not None:
+        cfg.set_option(ckeys.OPTIONKEY_MOUSE_DPI_NUMBER, args.mouse_dpi)
+    if args.in_place:
+        cfg.set_option(ckeys.OPTIONKEY_UPDATE_IN_PLACE_CHECK, True)
+    if args.timing:
+        cfg.set_option(ckeys.OPTIONKEY_TIMING_CHECK, True)
+    if args.timing_in_report:
+        cfg.set_option(ckeys.OPTIONKEY_TIMING_IN_REPORT_CHECK, True)
+    if args.profile:
+        cfg.set_option(ckeys.OPTIONKEY_PROFILE_CHECK, True)
+    if args.reports_folder is not None:
+        cfg.set_path(ckeys.PATHKEY_LOCAL_REPORTS, os.path.abspath(args.reports_folder))
+
+# prints progress to stderr, the report paths are the only output on stdout
+def print_progress(playlist_name, done, total, stage_text):
+    print(f'[{playlist_name}] {stage_text} ({done}/{total})', file=sys.stderr)
+
+def command_report(cfg, args):
+    # imported here, the analytics stack is not needed to list playlists
+    from models.report import Report
+    from models.statsindex import StatsIndex
+
+    apply_report_options(cfg, args)
+
+    playlists = load_playlists(cfg)
+    if not args.all_playlists:
+        if len(args.playlist) == 0:
+            raise ValueError('No playlist selected, use --playlist NAME or --all-playlists')
+        playlists = select_playlists(playlists, args.playlist)
+
+    os.makedirs(cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS), exist_ok=True)
+
+    # all reports share the stats folder index and the loaded stats
+    stats_index = StatsIndex(cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS))
+    stats_histories = dict()
+
+    exit_code = EXIT_OK
+    for playlist in playlists:
+        f_progress = None if args.quiet else (lambda done, total, stage_text, name=playlist.name: print_progress(name, done, total, stage_text))
+
+        try:
+            report = Report(playlist, cfg, stats_index=stats_index, stats_histories=stats_histories)
+            report_content = report.generate_report(f_progress)
+            report_path = report.write_report(report_content)
+
+            css_content = report.generate_css()
+            report.write_css(css_content)
+
+            if report.write_timing_log() is not None and not args.quiet:
+                print(f'[{playlist.name}] timing:\n{report.timer.get_summary()}', file=sys.stderr)
+
+            print(report_path)
+        except Exception as e:
+            print(f'ksv: error: playlist {playlist.name}: {e}', file=sys.stderr)
+            exit_code = EXIT_ERROR
+
+    return exit_code
+
+def command_dashboard(cfg, args):
+    from models.dashboard import Dashboard
+
+    if args.in_place:
+        cfg.set_option(ckeys.OPTIONKEY_UPDATE_IN_PLACE_CHECK, True)
+    if args.timing:
+        cfg.set_option(ckeys.OPTIONKEY_TIMING_CHECK, True)
+    if args.profile:
+        cfg.set_option(ckeys.OPTIONKEY_PROFILE_CHECK, True)
+    if args.reports_folder is not None:
+        cfg.set_path(ckeys.PATHKEY_LOCAL_REPORTS, os.path.abspath(args.reports_folder))
+
+    os.makedirs(cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS), exist_ok=True)
+    f_progress = None if args.quiet else (lambda done, total, stage_text: print_progress('dashboard', done, total, stage_text))
+
+    dashboard = Dashboard(cfg)
+    dashboard_content = dashboard.generate_report(f_progress)
+    dashboard_path = dashboard.write_report(dashboard_content)
+    dashboard.write_css(dashboard.generate_css())
+
+    if dashboard.write_timing_log() is not None and not args.quiet:
+        print(f'[dashboard] timing:\n{dashboard.timer.get_summary()}', file=sys.stderr)
+
+    print(dashboard_path)
+    return EXIT_OK
+
+def command_playlists(cfg, args):
+    for playlist in load_playlists(cfg):
+        print(playlist.get_listname())
+
+    return EXIT_OK
+
+COMMANDS = {
+    'report': command_report,
+    'dashboard': command_dashboard,
+    'playlists': command_playlists,
+}
+
+# returns the exit code
+def main(argv = None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        cfg = load_config(args)
+        return COMMANDS[args.command](cfg, args)
+    except Exception as e:
+        print(f'ksv: error: {e}', file=sys.stderr)
+        return EXIT_ERROR
@@ -1,4 +1,8 @@
+import time
+STARTUP_TIME = time.perf_counter()
+
 import os
+import sys
 
 from models.config import Config
 import models.config as ckeys
@@ -14,8 +18,11 @@ LOCAL_REPORTS_FOLDERNAME = 'reports'
 
 ICON_ERROR_FILENAME = 'icon_error.png'
 
+# prints a startup timing summary (time to first window, heavy imports)
+ARG_TIMING = '--timing'
+
 class Main():
-    def __init__(self):
+    def __init__(self, timing = False):
         # check config existance at run
         cfg_path = os.path.join(os.getcwd(), CONFIG_FILENAME)
         cfg_exists_at_run = os.path.exists(cfg_path)
@@ -27,14 +34,7 @@ class Main():
         self.cfg.set_app(ckeys.APPKEY_VERSION_OUTDATED, False)
         self.cfg.set_app(ckeys.APPKEY_VERSION_MISSCHECK, False)
 
-        try:
-            version_remote = VersionChecker()
-            version_remote.load_remote_version()
-
-            if version_local.compare_versions(version_remote) < 0:
-                self.cfg.set_app(ckeys.APPKEY_VERSION_OUTDATED, True)
-        except Exception as e:
-            self.cfg.set_app(ckeys.APPKEY_VERSION_MISSCHECK, True)
+        # the remote version is checked by the main window, in the background
 
         # check folders, then run koovaks folder prompt if no config was found earlier
         folders = self.create_folders()
@@ -47,8 +47,8 @@ class Main():
             window = BrowseKovaaksFolder(self.cfg, icon_error_path)
             window.mainloop()
 
-        # run the main gui
-        app = MainWindow(self.cfg)
+        # run the main gui, the stats cache is validated in the background once it is shown
+        app = MainWindow(self.cfg, startup_time=STARTUP_TIME if timing else None)
         app.mainloop()
 
     def create_folders(self):
@@ -65,4 +65,4 @@ class Main():
 # execution
 if __name__ == '__main__':
     os.chdir(os.path.dirname(__file__))
-    Main()
\ No newline at end of file
+    Main(timing=ARG_TIMING in sys.argv)
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+from models.charts import CHART_DPI, CHART_FIGSIZE
+
+CHART_CACHE_FOLDERNAME = 'chart_cache'
+CHART_CACHE_MAX_FILES = 512
+
+# bump when the chart drawing changes, so old images are not reused
+CHART_CACHE_VERSION = 2
+
+# shared cache of rendered chart images, stored next to config.json
+# images are keyed by a hash of everything that is drawn (data, colors, options),
+# so a scenario without new runs is never rendered twice
+class ChartCache:
+	def __init__(self, folder_path):
+		self.folder_path = folder_path
+		os.makedirs(self.folder_path, exist_ok=True)
+
+	def get_path(self, key):
+		return os.path.join(self.folder_path, f'{key}.png')
+
+	# returns the jobs whose image is not cached yet, redirected to their cache path
+	# identical jobs (ex: a scenario listed twice in a playlist) are rendered once, export links them all
+	def get_missing_jobs(self, jobs):
+		missing_jobs = dict()
+		for job in jobs:
+			key = ChartCache.get_key(job)
+			cache_path = self.get_path(key)
+			if key not in missing_jobs and not os.path.isfile(cache_path):
+				missing_jobs[key] = {**job, 'fpath': cache_path}
+
+		return list(missing_jobs.values())
+
+	# places the cached image of every job at its output path (hard link, or copy)
+	def export(self, jobs):
+		for job in jobs:
+			cache_path = self.get_path(ChartCache.get_key(job))
+
+			# keeps recently used images from being pruned
+			os.utime(cache_path)
+
+			if os.path.exists(job['fpath']):
+				os.remove(job['fpath'])
+
+			try:
+				os.link(cache_path, job['fpath'])
+			except OSError:
+				shutil.copyfile(cache_path, job['fpath'])
+
+	# removes the least recently used images above max_files
+	def prune(self, max_files = CHART_CACHE_MAX_FILES):
+		with os.scandir(self.folder_path) as it:
+			entries = [entry for entry in it if entry.name.endswith('.png')]
+
+		if len(entries) <= max_files:
+			return
+
+		entries.sort(key=lambda entry: entry.stat().st_mtime)
+		for entry in entries[:len(entries) - max_files]:
+			os.remove(entry.path)
+
+	def __repr__(self):
+		return f'ChartCache:{self.folder_path}'
+
+	# hash of everything a chart job draws, the output path is not part of it
+	@staticmethod
+	def get_key(job):
+		h = hashlib.sha256()
+		h.update(f'{CHART_CACHE_VERSION}:{CHART_DPI}:{CHART_FIGSIZE}'.encode())
+
+		# arrays (data_x, data_y, ...) are hashed by content, everything else as json
+		array_keys = sorted(key for key, value in job.items() if key.startswith('data_') and (value is None or isinstance(value, np.ndarray)))
+		for key in array_keys:
+			h.update(key.encode())
+			if job[key] is None:
+				h.update(b'none')
+			else:
+				h.update(str(np.shape(job[key])).encode())
+				h.update(np.ascontiguousarray(job[key], dtype=np.float64).tobytes())
+
+		options = {key: value for key, value in job.items() if key not in array_keys and key != 'fpath'}
+		h.update(json.dumps(options, sort_keys=True, default=str).encode())
+
+		return h.hexdigest()
+
+	# returns the cache that lives next to the config file
+	@staticmethod
+	def from_config(cfg):
+		return ChartCache(os.path.join(os.path.dirname(cfg.cfg_path), CHART_CACHE_FOLDERNAME))
@@ -0,0 +1,336 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait as futures_wait
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.patheffects as pe
+from scipy.interpolate import PchipInterpolator
+
+import models.config as ckeys
+from models.statsengine import get_sorted_quantiles
+import util.utilities as utilities
+
+CHAR_TRIANGLE_SMALL_UP = '\u25B4'
+CHAR_TRIANGLE_SMALL_DOWN = '\u25BE'
+
+CHART_DPI = 300
+
+CHART_FIGSIZE = (10, 5)
+
+# below this number of charts a process pool costs more than it saves
+CHARTS_PARALLEL_THRESHOLD = 4
+
+# seconds between cancellation checks while waiting for a render
+CANCEL_POLL_INTERVAL = 0.1
+
+# what a chart job draws
+CHART_KIND_SCORE = 'score'
+CHART_KIND_TTK = 'ttk'
+CHART_KIND_HEATMAP = 'heatmap'
+CHART_KIND_WEEKLY = 'weekly'
+
+WEEKDAYS_LABELS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+# chart jobs are plain dicts, so they can be sent to the render workers:
+# data_x: timestamps (epoch seconds)
+# data_y: scores or target value
+# data_y_avg: averages over time of data_y, or None
+# data_y_values: statistical values of data_y (min, max, etc)
+# data_y_quantiles: quantiles of data_y (min, quartiles, max), the y ticks
+# graphs: the GRAPHS section of the config (colors)
+# percentages: whether to annotate the percentage vs average
+# fpath: output image path
+# kind: CHART_KIND_SCORE if missing, CHART_KIND_TTK jobs draw the ttk distribution of every run:
+#	data_y: median ttk, data_y_low: p10 ttk, data_y_high: p90 ttk
+# CHART_KIND_HEATMAP and CHART_KIND_WEEKLY jobs draw values per day or week:
+#	data_x: first day of every week (days since epoch), data_z: runs per weekday (7 x weeks), data_y: value per week
+#	label: name of the weekly value
+
+# one figure per process, reused by every chart
+# figures are created with the object oriented api, pyplot never holds a reference to them
+_figure = None
+_figure_lock = threading.Lock()
+
+def get_figure():
+	global _figure
+	if _figure is None:
+		_figure = Figure(figsize=CHART_FIGSIZE)
+		FigureCanvasAgg(_figure)
+
+	return _figure
+
+# renders the chart of one scenario, returns the image path
+def render_chart(job):
+	with _figure_lock:
+		fig = get_figure()
+		try:
+			kind = job.get('kind', CHART_KIND_SCORE)
+			if kind == CHART_KIND_TTK:
+				return draw_ttk_chart(fig, job)
+			elif kind == CHART_KIND_HEATMAP:
+				return draw_heatmap_chart(fig, job)
+			elif kind == CHART_KIND_WEEKLY:
+				return draw_weekly_chart(fig, job)
+
+			return draw_chart(fig, job)
+		finally:
+			# drops the artists, so the data of the last chart is not kept alive
+			fig.clear()
+
+def draw_chart(fig, job):
+	data_x = [datetime.fromtimestamp(t) for t in job['data_x']]
+	data_y = job['data_y']
+	data_y_avg = job['data_y_avg']
+	data_y_values = job['data_y_values']
+	graphs = job['graphs']
+
+	if len(data_x) >= 2:
+		# smooth x data
+		x_floats = job['data_x']
+		x_smooth_floats = np.linspace(x_floats[0], x_floats[-1], 500)
+		x_smooth = [datetime.fromtimestamp(t) for t in x_smooth_floats]
+		
+		# score curve
+		interpolated_score = PchipInterpolator(x_floats, data_y)
+		y_smooth = interpolated_score(x_smooth_floats)
+
+		# average curve
+		if data_y_avg is not None:
+			interpolated_avg = PchipInterpolator(x_floats, data_y_avg)
+			y_smooth_avg = interpolated_avg(x_smooth_floats)
+
+	ax = fig.add_subplot()
+
+	# plot week lines
+	min_x = min(data_x)
+	x = max(data_x) - timedelta(days=7)
+	while x > min_x:
+		ax.axvline(x=x, linestyle=(0, (5, 5)), color=graphs[ckeys.GRAPHKEY_COLOR_WEEKLINE], alpha=0.3, linewidth=0.75)
+		x = x - timedelta(days=7)
+
+	# plot max and min
+	min_y = data_y_values['min']
+	max_y = data_y_values['max']
+	ax.axhline(y=min_y, linestyle=(0, (5, 5)), color=graphs[ckeys.GRAPHKEY_COLOR_MIN], alpha=0.5, linewidth=0.75)
+	ax.axhline(y=max_y, linestyle=(0, (5, 5)), color=graphs[ckeys.GRAPHKEY_COLOR_MAX], alpha=0.5, linewidth=0.75)
+
+	# plot curves
+	if len(data_x) >= 2:
+		ax.plot(x_smooth, y_smooth, '-', color=graphs[ckeys.GRAPHKEY_COLOR_SCORECURVE])
+
+		if data_y_avg is not None:
+			ax.plot(x_smooth, y_smooth_avg, '--', color=graphs[ckeys.GRAPHKEY_COLOR_AVERAGECURVE])
+	else:
+		ax.plot(data_x, data_y, '-', color=graphs[ckeys.GRAPHKEY_COLOR_SCORECURVE])
+
+		if data_y_avg is not None:
+			ax.plot(data_x, data_y_avg, '--', color=graphs[ckeys.GRAPHKEY_COLOR_AVERAGECURVE])
+
+	# plot points
+	ax.plot(data_x, data_y, 'o', color=graphs[ckeys.GRAPHKEY_COLOR_SCOREDATA], label='score')
+
+	if data_y_avg is not None:
+		ax.plot(data_x, data_y_avg, 'o', color=graphs[ckeys.GRAPHKEY_COLOR_AVERAGEDATA], label='avg')
+
+	# ticks, x at the quartiles of the sorted timestamps, y at the quartiles computed with the stats
+	xticks = [datetime.fromtimestamp(t) for t in get_sorted_quantiles(np.asarray(job['data_x'], dtype=np.float64)).tolist()]
+	xticks_str = [d.strftime('%d-%m') for d in xticks]
+
+	yticks = list(set([round(y) for y in job['data_y_quantiles']]))
+
+	if round(min_y) not in yticks:
+		yticks.append(min_y)
+
+	if round(max_y) not in yticks:
+		yticks.append(max_y)
+
+	yticks.sort()
+	yticks_str = [round(y) for y in yticks]
+
+	ax.set_xticks(xticks)
+	ax.set_xticklabels(xticks_str)
+	ax.tick_params(axis='x', labelsize=7, color=graphs[ckeys.GRAPHKEY_COLOR_XTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_XTICKSLABELS])
+
+	ax.set_yticks(yticks)
+	ax.set_yticklabels(yticks_str)
+	ax.tick_params(axis='y', labelsize=7, color=graphs[ckeys.GRAPHKEY_COLOR_YTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_YTICKSLABELS])
+
+	# borders
+	ax.spines['top'].set_visible(False)
+	ax.spines['right'].set_visible(False)
+
+	ax.spines['left'].set_color(graphs[ckeys.GRAPHKEY_COLOR_BORDERLEFT])
+	ax.spines['bottom'].set_color(graphs[ckeys.GRAPHKEY_COLOR_BORDERBOTTOM])
+
+	# annotations
+	if job['percentages'] and data_y_avg is not None:
+		for i in range(len(data_y)):
+			percentage = data_y[i]/data_y_avg[i]*100
+
+			if percentage != 100:
+				percentage_txt = round(percentage - 100 if percentage > 100 else 100 - percentage, 1)
+				color = graphs[ckeys.GRAPHKEY_COLOR_PERCENTAGE_POSITIVE] if percentage > 100 else graphs[ckeys.GRAPHKEY_COLOR_PERCENTAGE_NEGATIVE]
+				symbol = CHAR_TRIANGLE_SMALL_UP if percentage > 100 else CHAR_TRIANGLE_SMALL_DOWN
+				text = f'{symbol} {percentage_txt}%'
+				y_offset = 50 if percentage > 100 else -50
+
+				ax.annotate(text, (data_x[i], data_y[i]), ha='center', textcoords='offset pixels', xytext=(0, y_offset), 
+                                            color=color, fontsize=9, path_effects=[pe.withStroke(linewidth=1.5, foreground=graphs[ckeys.GRAPHKEY_COLOR_PERCENTAGE_OUTLINE])])
+
+	return save_chart(fig, job)
+
+# draws the ttk distribution of every run: median ttk, with the p10-p90 band
+def draw_ttk_chart(fig, job):
+	data_x = [datetime.fromtimestamp(t) for t in job['data_x']]
+	data_y = job['data_y']
+	graphs = job['graphs']
+
+	ax = fig.add_subplot()
+
+	# p10-p90 band and overall median
+	ax.fill_between(data_x, job['data_y_low'], job['data_y_high'], color=graphs[ckeys.GRAPHKEY_COLOR_SCORECURVE], alpha=0.2, linewidth=0)
+	ax.axhline(y=job['data_y_values']['median'], linestyle=(0, (5, 5)), color=graphs[ckeys.GRAPHKEY_COLOR_MIN], alpha=0.5, linewidth=0.75)
+
+	# median of every run
+	ax.plot(data_x, data_y, '-', color=graphs[ckeys.GRAPHKEY_COLOR_SCORECURVE], linewidth=0.75)
+	ax.plot(data_x, data_y, 'o', color=graphs[ckeys.GRAPHKEY_COLOR_SCOREDATA], markersize=3, label='median ttk')
+
+	# ticks
+	xticks = [data_x[0], np.quantile(data_x, 0.25), np.quantile(data_x, 0.5), np.quantile(data_x, 0.75), data_x[-1]]
+	xticks_str = [d.strftime('%d-%m') for d in xticks]
+
+	yticks = sorted(set(round(float(y), 2) for y in np.quantile(np.concatenate((job['data_y_low'], job['data_y_high'])), [0, 0.5, 1])))
+	yticks_str = [f'{y:.2f}s' for y in yticks]
+
+	ax.set_xticks(xticks)
+	ax.set_xticklabels(xticks_str)
+	ax.tick_params(axis='x', labelsize=7, color=graphs[ckeys.GRAPHKEY_COLOR_XTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_XTICKSLABELS])
+
+	ax.set_yticks(yticks)
+	ax.set_yticklabels(yticks_str)
+	ax.tick_params(axis='y', labelsize=7, color=graphs[ckeys.GRAPHKEY_COLOR_YTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_YTICKSLABELS])
+
+	# borders
+	ax.spines['top'].set_visible(False)
+	ax.spines['right'].set_visible(False)
+
+	ax.spines['left'].set_color(graphs[ckeys.GRAPHKEY_COLOR_BORDERLEFT])
+	ax.spines['bottom'].set_color(graphs[ckeys.GRAPHKEY_COLOR_BORDERBOTTOM])
+
+	return save_chart(fig, job)
+
+# returns the dates of days since epoch
+def get_epoch_dates(days):
+	return [datetime(1970, 1, 1) + timedelta(days=int(day)) for day in days]
+
+# draws the runs of every day, one column per week and one row per weekday
+def draw_heatmap_chart(fig, job):
+	data_z = np.asarray(job['data_z'], dtype=np.float64)
+	weeks = get_epoch_dates(job['data_x'])
+	graphs = job['graphs']
+
+	ax = fig.add_subplot()
+
+	# days without runs are left transparent
+	cmap = LinearSegmentedColormap.from_list('runs', [graphs[ckeys.GRAPHKEY_COLOR_WEEKLINE], graphs[ckeys.GRAPHKEY_COLOR_SCORECURVE]])
+	ax.imshow(np.ma.masked_equal(data_z, 0), cmap=cmap, aspect='equal', interpolation='nearest', vmin=1)
+
+	# one tick on the first week of every month
+	xticks = [i for i, week in enumerate(weeks) if i == 0 or week.month != weeks[i-1].month]
+	ax.set_xticks(xticks)
+	ax.set_xticklabels([weeks[i].strftime('%b %y') for i in xticks])
+	ax.tick_params(axis='x', labelsize=6, color=graphs[ckeys.GRAPHKEY_COLOR_XTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_XTICKSLABELS])
+
+	ax.set_yticks(range(len(WEEKDAYS_LABELS)))
+	ax.set_yticklabels(WEEKDAYS_LABELS)
+	ax.tick_params(axis='y', labelsize=6, color=graphs[ckeys.GRAPHKEY_COLOR_YTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_YTICKSLABELS])
+
+	for spine in ax.spines.values():
+		spine.set_visible(False)
+
+	return save_chart(fig, job)
+
+# draws one bar per week
+def draw_weekly_chart(fig, job):
+	weeks = get_epoch_dates(job['data_x'])
+	data_y = job['data_y']
+	graphs = job['graphs']
+
+	ax = fig.add_subplot()
+	ax.bar(weeks, data_y, width=5, align='edge', color=graphs[ckeys.GRAPHKEY_COLOR_SCORECURVE])
+	ax.set_ylabel(job['label'], fontsize=7, color=graphs[ckeys.GRAPHKEY_COLOR_YTICKSLABELS])
+
+	# ticks
+	xticks = [weeks[0], np.quantile(weeks, 0.25), np.quantile(weeks, 0.5), np.quantile(weeks, 0.75), weeks[-1]]
+	ax.set_xticks(xticks)
+	ax.set_xticklabels([d.strftime('%d-%m-%y') for d in xticks])
+	ax.tick_params(axis='x', labelsize=7, color=graphs[ckeys.GRAPHKEY_COLOR_XTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_XTICKSLABELS])
+	ax.tick_params(axis='y', labelsize=7, color=graphs[ckeys.GRAPHKEY_COLOR_YTICKS], labelcolor=graphs[ckeys.GRAPHKEY_COLOR_YTICKSLABELS])
+
+	# borders
+	ax.spines['top'].set_visible(False)
+	ax.spines['right'].set_visible(False)
+
+	ax.spines['left'].set_color(graphs[ckeys.GRAPHKEY_COLOR_BORDERLEFT])
+	ax.spines['bottom'].set_color(graphs[ckeys.GRAPHKEY_COLOR_BORDERBOTTOM])
+
+	return save_chart(fig, job)
+
+def save_chart(fig, job):
+	# layout
+	fig.tight_layout()
+
+	# written aside and moved in place, so an interrupted render never leaves a broken image
+	tmp_fpath = job['fpath'] + '.tmp'
+	fig.savefig(tmp_fpath, format='png', dpi=CHART_DPI, transparent=True)
+	os.replace(tmp_fpath, job['fpath'])
+
+	return job['fpath']
+
+# starts rendering the charts, in a process pool when there are enough of them
+# returns a function wait(f_progress, cancel_event) that waits for the renders and
+# returns the image paths in the order of jobs
+# f_progress is called as f_progress(charts_done, charts_total) after every chart
+# when cancel_event is set, the remaining renders are dropped and ReportCancelledException is raised
+def render_charts_async(jobs, max_workers = None):
+	if len(jobs) < CHARTS_PARALLEL_THRESHOLD or max_workers == 1 or (os.cpu_count() or 1) == 1:
+		def wait(f_progress = None, cancel_event = None):
+			fpaths = []
+			for job in jobs:
+				utilities.check_cancelled(cancel_event)
+				fpaths.append(render_chart(job))
+				if f_progress is not None:
+					f_progress(len(fpaths), len(jobs))
+
+			return fpaths
+
+		return wait
+
+	executor = ProcessPoolExecutor(max_workers=max_workers)
+	futures = [executor.submit(render_chart, job) for job in jobs]
+
+	def wait(f_progress = None, cancel_event = None):
+		try:
+			fpaths = []
+			for future in futures:
+				while not future.done():
+					utilities.check_cancelled(cancel_event)
+					futures_wait([future], timeout=CANCEL_POLL_INTERVAL)
+
+				fpaths.append(future.result())
+				if f_progress is not None:
+					f_progress(len(fpaths), len(jobs))
+
+			return fpaths
+		finally:
+			executor.shutdown(cancel_futures=True)
+
+	return wait
+
+def render_charts(jobs, max_workers = None):
+	return render_charts_async(jobs, max_workers)()
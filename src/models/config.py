@@ -2,9 +2,14 @@ from importlib.resources import path
 import json
 import os
 import io
+import atexit
+import threading
 
 CONFIG_FILENAME = 'config.json'
 
+# seconds without changes before the config is written to disk
+CONFIG_SAVE_DELAY = 1.0
+
 SECTION_PATH = 'PATHS'
 SECTION_OPTIONS = 'OPTIONS'
 SECTION_CSS = 'CSS'
@@ -49,18 +54,48 @@ OPTIONKEY_DAYS_CHECK = 'option:days_check'
 OPTIONKEY_DAYS_NUMBER = 'option:days_number'
 OPTIONKEY_AVERAGE_CHECK = 'option:display_average_check'
 OPTIONKEY_PERCENTAGES_CHECK = 'option:percentages_check'
+OPTIONKEY_SMOOTHING_MODE = 'option:smoothing_mode'
+OPTIONKEY_UPDATE_IN_PLACE_CHECK = 'option:update_in_place_check'
+OPTIONKEY_TIMING_CHECK = 'option:timing_check'
+OPTIONKEY_TIMING_IN_REPORT_CHECK = 'option:timing_in_report_check'
+OPTIONKEY_PROFILE_CHECK = 'option:profile_check'
+OPTIONKEY_DEEP_PARSE_CHECK = 'option:deep_parse_check'
+OPTIONKEY_SENS_CHECK = 'option:sens_check'
+OPTIONKEY_SENS_BUCKET_NUMBER = 'option:sens_bucket_number'
+OPTIONKEY_MOUSE_DPI_NUMBER = 'option:mouse_dpi_number'
+OPTIONKEY_DOWNSAMPLE_MODE = 'option:downsample_mode'
+OPTIONKEY_DOWNSAMPLE_NUMBER = 'option:downsample_number'
 
 APPKEY_VERSION = 'version:version_number'
 APPKEY_VERSION_OUTDATED = 'version:version_outdated'
 APPKEY_VERSION_MISSCHECK = 'version:version_misscheck'
 
+SMOOTHING_MODE_MEAN = 'mean'
+SMOOTHING_MODE_EWM = 'ewm'
+SMOOTHING_MODE_MEDIAN = 'median'
+SMOOTHING_MODES = [SMOOTHING_MODE_MEAN, SMOOTHING_MODE_EWM, SMOOTHING_MODE_MEDIAN]
+
+DOWNSAMPLE_MODE_NONE = 'none'
+DOWNSAMPLE_MODE_LTTB = 'lttb'
+DOWNSAMPLE_MODE_DAILY = 'daily'
+DOWNSAMPLE_MODES = [DOWNSAMPLE_MODE_NONE, DOWNSAMPLE_MODE_LTTB, DOWNSAMPLE_MODE_DAILY]
+
 KOVAAKS_STATS_SUBPATH = os.path.join('FPSAimTrainer', 'stats')
 KOVAAKS_PLAYLISTS_SUBPATH = os.path.join('FPSAimTrainer', 'Saved', 'SaveGames', 'Playlists')
 LOCAL_STYLE_SUBPATH = os.path.join('style_template.css')
 
 class Config:
-    def __init__(self, cfg_path):
+    # autosave: if False, changes are kept in memory only and config.json is never written
+    #           (ex: command line overrides)
+    def __init__(self, cfg_path, autosave = True):
         self.cfg_path = cfg_path
+        self.autosave_ = autosave
+
+        # changes are written behind, coalesced by a debounce timer and flushed at exit
+        self.lock_ = threading.RLock()
+        self.save_timer_ = None
+        self.dirty_ = False
+        atexit.register(self.flush)
 
         self.data_ = dict()
         if os.path.isfile(self.cfg_path):
@@ -78,11 +113,51 @@ class Config:
 
     def load_config(self):
         with io.open(self.cfg_path, 'r') as fp:
-            self.set_data(json.load(fp))
+            data = json.load(fp)
 
+        # start from the defaults, so keys added by newer versions are always present
+        self.create_default_config()
+        for section, values in data.items():
+            self.get_data().setdefault(section, dict()).update(values)
+
+    # writes the config to disk now
     def save_config(self):
-        with io.open(self.cfg_path, 'w') as fp:
-            json.dump(self.get_data(), fp, indent=4)
+        with self.lock_:
+            self.dirty_ = True
+            self.flush()
+
+    # schedules a write, changes made within CONFIG_SAVE_DELAY seconds are written together
+    def request_save(self):
+        with self.lock_:
+            self.dirty_ = True
+            if not self.autosave_:
+                return
+
+            if self.save_timer_ is not None:
+                self.save_timer_.cancel()
+
+            self.save_timer_ = threading.Timer(CONFIG_SAVE_DELAY, self.flush)
+            self.save_timer_.daemon = True
+            self.save_timer_.start()
+
+    # writes pending changes, atomically (temp file + rename)
+    # the lock is held until the rename, so flushes from different threads never share the temp file
+    def flush(self):
+        with self.lock_:
+            if self.save_timer_ is not None:
+                self.save_timer_.cancel()
+                self.save_timer_ = None
+
+            if not self.dirty_ or not self.autosave_:
+                return
+
+            content = json.dumps(self.get_data(), indent=4)
+            self.dirty_ = False
+
+            tmp_path = self.cfg_path + '.tmp'
+            with io.open(tmp_path, 'w') as fp:
+                fp.write(content)
+            os.replace(tmp_path, self.cfg_path)
 
     def create_default_config(self):
         # paths
@@ -110,6 +185,17 @@ class Config:
         options[OPTIONKEY_DAYS_NUMBER] = 30
         options[OPTIONKEY_AVERAGE_CHECK] = True
         options[OPTIONKEY_PERCENTAGES_CHECK] = True
+        options[OPTIONKEY_SMOOTHING_MODE] = SMOOTHING_MODE_MEAN
+        options[OPTIONKEY_UPDATE_IN_PLACE_CHECK] = False
+        options[OPTIONKEY_TIMING_CHECK] = False
+        options[OPTIONKEY_TIMING_IN_REPORT_CHECK] = False
+        options[OPTIONKEY_PROFILE_CHECK] = False
+        options[OPTIONKEY_DEEP_PARSE_CHECK] = False
+        options[OPTIONKEY_SENS_CHECK] = False
+        options[OPTIONKEY_SENS_BUCKET_NUMBER] = 2
+        options[OPTIONKEY_MOUSE_DPI_NUMBER] = 800
+        options[OPTIONKEY_DOWNSAMPLE_MODE] = DOWNSAMPLE_MODE_NONE
+        options[OPTIONKEY_DOWNSAMPLE_NUMBER] = 200
 
         # css
         self.get_data()[SECTION_CSS] = dict()
@@ -162,14 +248,18 @@ class Config:
         if path_key not in paths:
             raise KeyError(f'Invalid config path key: {path_key}')
 
-        paths[path_key] = path
+        if paths[path_key] == path:
+            return
+
+        with self.lock_:
+            paths[path_key] = path
 
         if path_key == PATHKEY_KOVAAKS_FOLDER:
             self.update_kovaaks_paths()
         elif path_key == PATHKEY_LOCAL_RESOURCES:
             self.update_local_paths()
 
-        self.save_config()
+        self.request_save()
 
     def update_kovaaks_paths(self):
         kovaaks_folder = self.get_path(PATHKEY_KOVAAKS_FOLDER)
@@ -213,9 +303,13 @@ class Config:
             raise KeyError(f'Invalid config option key: {option_key}')
         
         value_casted = type(options[option_key])(value)
-        options[option_key] = value_casted
+        if options[option_key] == value_casted:
+            return
+
+        with self.lock_:
+            options[option_key] = value_casted
 
-        self.save_config()
+        self.request_save()
 
     def get_app(self, app_key):
         app = self.get_data()[SECTION_APP]
@@ -229,4 +323,5 @@ class Config:
         if app_key not in app:
             raise KeyError(f'Invalid app option key: {app_key}')
 
-        app[app_key] = value
+        with self.lock_:
+            app[app_key] = value
@@ -0,0 +1,281 @@
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+
+import yattag
+
+import models.charts as charts
+from models.statsengine import get_local_days, get_weeks, get_week_start_days
+from models.chartcache import ChartCache
+from models.report import Report, REPORT_FOLDERNAME_PREFIX, REPORT_RESOURCES_FOLDERNAME, TIMING_SECTION_MARK
+import models.config as ckeys
+from models.config import Config
+from util.exceptions import ReportCancelledException
+import util.utilities as utilities
+import util.timing as timing
+
+DASHBOARD_FOLDERNAME = f'{REPORT_FOLDERNAME_PREFIX}dashboard'
+
+# weeks shown in the activity heatmap
+DASHBOARD_HEATMAP_WEEKS = 52
+
+# scenarios listed in the scenarios table, the most played first
+DASHBOARD_TOP_SCENARIOS = 25
+
+# summary columns loaded for the whole stats folder
+DASHBOARD_KEYS = ['score', 'fight_time']
+
+# returns a mask of the runs that beat the previous best score of their scenario (first runs excluded)
+# codes: scenario of every run, runs must be sorted by scenario then timestamp
+# the running best of every scenario is computed in one accumulate, each scenario is offset above the previous one
+def get_new_bests(codes, scores, starts):
+	if len(scores) == 0:
+		return np.zeros(0, dtype=bool)
+
+	scores = np.where(np.isfinite(scores), scores, np.nanmin(scores) if np.any(np.isfinite(scores)) else 0)
+	span = scores.max() - scores.min() + 1
+	shifted = scores - scores.min() + codes * span
+
+	previous_best = np.maximum.accumulate(shifted)[:-1]
+	new_bests = np.concatenate(([False], shifted[1:] > previous_best))
+	new_bests[starts] = False
+	return new_bests
+
+# whole training history across every scenario of the stats folder: activity heatmap, playtime and
+# personal bests per week, totals and a table of the most played scenarios
+# all scenarios are fed from a single columnar load of the stats cache, every aggregate is a numpy reduction
+class Dashboard(Report):
+	def __init__(self, cfg: Config, stats_index = None):
+		super().__init__(None, cfg, stats_index=stats_index)
+
+	# returns the names, timestamps and DASHBOARD_KEYS columns of every run
+	def load_all_stats(self, f_progress = None, cancel_event = None):
+		return self.get_stats_cache().get_columns(self.get_stats_index(), DASHBOARD_KEYS, f_progress, cancel_event)
+
+	# returns the dashboard data: totals, weeks, scenarios and the chart jobs
+	def make_dashboard_data(self, names, timestamps, columns):
+		if len(timestamps) == 0:
+			return None
+
+		# runs sorted by scenario then time, so every scenario is a contiguous slice
+		scenarios_names, codes = np.unique(names, return_inverse=True)
+		order = np.lexsort((timestamps, codes))
+		codes = codes[order]
+		timestamps = timestamps[order]
+		scores = columns['score'][order]
+		fight_time = np.nan_to_num(columns['fight_time'][order])
+
+		starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+		counts = np.diff(np.append(starts, len(codes)))
+		new_bests = get_new_bests(codes, scores, starts)
+
+		days = get_local_days(timestamps)
+		weeks, weekdays = get_weeks(days)
+
+		# totals
+		totals = dict()
+		totals['runs'] = len(timestamps)
+		totals['scenarios'] = len(scenarios_names)
+		totals['playtime'] = fight_time.sum()
+		totals['days'] = len(np.unique(days))
+		totals['first'] = datetime.fromtimestamp(int(timestamps.min()))
+		totals['last'] = datetime.fromtimestamp(int(timestamps.max()))
+		totals['new_bests'] = int(new_bests.sum())
+
+		# per week, every week from the first to the current one
+		# (or to the last one, runs can be dated in the future with a wrong clock)
+		current_week = get_weeks(get_local_days(np.array([int(datetime.now().timestamp())])))[0][0]
+		first_week = weeks.min()
+		last_week = max(current_week, weeks.max())
+		weeks_n = int(last_week - first_week + 1)
+		week_days = get_week_start_days(np.arange(first_week, last_week + 1))
+		playtime_per_week = np.bincount(weeks - first_week, weights=fight_time, minlength=weeks_n) / 3600
+		bests_per_week = np.bincount(weeks - first_week, weights=new_bests, minlength=weeks_n)
+
+		# runs per day of the last weeks, 7 rows (weekdays) by DASHBOARD_HEATMAP_WEEKS columns
+		heatmap_first_week = current_week - DASHBOARD_HEATMAP_WEEKS + 1
+		recent = (weeks >= heatmap_first_week) & (weeks <= current_week)
+		cells = (weeks[recent] - heatmap_first_week) * 7 + weekdays[recent]
+		runs_per_day = np.bincount(cells, minlength=DASHBOARD_HEATMAP_WEEKS * 7).reshape(DASHBOARD_HEATMAP_WEEKS, 7).T
+
+		# per scenario, the best score and the first run that reached it
+		best_order = np.lexsort((-timestamps, np.nan_to_num(scores, nan=-np.inf), codes))
+		best_runs = best_order[starts + counts - 1]
+		playtimes = np.add.reduceat(fight_time, starts)
+		last_played = np.maximum.reduceat(timestamps, starts)
+
+		scenarios = []
+		for i in np.argsort(-counts, kind='stable')[:DASHBOARD_TOP_SCENARIOS].tolist():
+			best = scores[best_runs[i]]
+			scenarios.append({
+				'name': scenarios_names[i],
+				'runs': int(counts[i]),
+				'playtime': float(playtimes[i]),
+				'best': round(float(best)) if np.isfinite(best) else '-',
+				'best_date': datetime.fromtimestamp(int(timestamps[best_runs[i]])),
+				'last_played': datetime.fromtimestamp(int(last_played[i])),
+			})
+
+		graphs = dict(self.cfg.get_data()[ckeys.SECTION_GRAPHS])
+		chart_jobs = dict()
+		chart_jobs['heatmap'] = {
+			'kind': charts.CHART_KIND_HEATMAP,
+			'data_x': get_week_start_days(np.arange(heatmap_first_week, current_week + 1)),
+			'data_z': runs_per_day,
+			'graphs': graphs,
+			'fpath': os.path.join(self.resources_folder_path, 'activity.png'),
+		}
+		chart_jobs['playtime'] = {
+			'kind': charts.CHART_KIND_WEEKLY,
+			'data_x': week_days,
+			'data_y': playtime_per_week,
+			'label': 'hours played',
+			'graphs': graphs,
+			'fpath': os.path.join(self.resources_folder_path, 'playtime.png'),
+		}
+		chart_jobs['bests'] = {
+			'kind': charts.CHART_KIND_WEEKLY,
+			'data_x': week_days,
+			'data_y': bests_per_week,
+			'label': 'new personal bests',
+			'graphs': graphs,
+			'fpath': os.path.join(self.resources_folder_path, 'personal_bests.png'),
+		}
+
+		dashboard = dict()
+		dashboard['totals'] = totals
+		dashboard['scenarios'] = scenarios
+		dashboard['chart_jobs'] = chart_jobs
+		return dashboard
+
+	# returns the html of one dashboard block: a title, an optional chart and an optional table
+	# rows: list of rows of cells, the first row is the header if header is True
+	def generate_block(self, title, chart_job = None, rows = None, header = False):
+		doc, tag, text = yattag.Doc().tagtext()
+
+		with tag('div', klass='scenario'):
+			with tag('div', klass='title'):
+				with tag('h3', klass='name'):
+					text(title)
+
+			with tag('div', klass='content'):
+				if chart_job is not None:
+					img_path_href = os.path.join('.', os.path.relpath(chart_job['fpath'], self.report_folder_path))
+					doc.stag('img', src=img_path_href, klass='graph')
+
+				if rows is not None:
+					with tag('div', klass='data'):
+						with tag('table', klass='datatable'):
+							with tag('tbody'):
+								for i, row in enumerate(rows):
+									with tag('tr'):
+										for j, cell in enumerate(row):
+											if header and i == 0:
+												klass = 'bottomborder'
+											elif j == 0:
+												klass = 'category rightborder'
+											else:
+												klass = 'value'
+
+											with tag('td', klass=klass):
+												text(cell)
+
+		return doc.getvalue()
+
+	def generate_report(self, f_progress = None, cancel_event = None, update_in_place = None):
+		if update_in_place is None:
+			update_in_place = self.cfg.get_option(ckeys.OPTIONKEY_UPDATE_IN_PLACE_CHECK)
+
+		self.create_folders(update_in_place)
+
+		try:
+			with timing.profile(self.cfg.get_option(ckeys.OPTIONKEY_PROFILE_CHECK), self.report_folder_path):
+				return self.generate_report_content(f_progress, cancel_event)
+		except ReportCancelledException:
+			if not update_in_place:
+				shutil.rmtree(self.report_folder_path, ignore_errors=True)
+			raise
+
+	def generate_report_content(self, f_progress = None, cancel_event = None):
+		if f_progress is None:
+			f_progress = lambda done, total, stage_text: None
+
+		with self.timer.stage('load stats'):
+			names, timestamps, columns = self.load_all_stats(f_progress=lambda done, total: f_progress(done, total, 'Parsing stat files'), cancel_event=cancel_event)
+
+		utilities.check_cancelled(cancel_event)
+		with self.timer.stage('aggregates'):
+			dashboard = self.make_dashboard_data(names, timestamps, columns)
+
+		chart_jobs = list(dashboard['chart_jobs'].values()) if dashboard is not None else []
+		with self.timer.stage('start rendering'):
+			chart_cache = ChartCache.from_config(self.cfg)
+			wait_charts = charts.render_charts_async(chart_cache.get_missing_jobs(chart_jobs))
+
+		with self.timer.stage('html assembly'):
+			doc, tag, text = yattag.Doc().tagtext()
+
+			with tag('h2', klass='playlist-name'):
+				text('Dashboard: all scenarios')
+
+			if dashboard is None:
+				with tag('div', klass='no-scenarios'):
+					with tag('p'):
+						text('No stat files found!')
+			else:
+				totals = dashboard['totals']
+				doc.asis(self.generate_block('Totals', rows=[
+					('Runs', totals['runs']),
+					('Scenarios', totals['scenarios']),
+					('Playtime', Dashboard.format_duration(totals['playtime'])),
+					('Days played', totals['days']),
+					('First run', totals['first'].strftime('%d-%m-%y')),
+					('Last run', totals['last'].strftime('%d-%m-%y')),
+					('New PBs', totals['new_bests']),
+				]))
+				doc.stag('hr', klass='scenario-sep')
+
+				chart_jobs_by_name = dashboard['chart_jobs']
+				doc.asis(self.generate_block(f'Runs per day, last {DASHBOARD_HEATMAP_WEEKS} weeks', chart_jobs_by_name['heatmap']))
+				doc.stag('hr', klass='scenario-sep')
+				doc.asis(self.generate_block('Playtime per week', chart_jobs_by_name['playtime']))
+				doc.stag('hr', klass='scenario-sep')
+				doc.asis(self.generate_block('Personal bests per week', chart_jobs_by_name['bests']))
+				doc.stag('hr', klass='scenario-sep')
+
+				rows = [('Scenario', 'Runs', 'Playtime', 'PB', 'PB date', 'Last played')]
+				rows += [(s['name'], s['runs'], Dashboard.format_duration(s['playtime']), s['best'], s['best_date'].strftime('%d-%m-%y'), s['last_played'].strftime('%d-%m-%y'))
+						for s in dashboard['scenarios']]
+				doc.asis(self.generate_block(f'Most played scenarios (top {DASHBOARD_TOP_SCENARIOS})', rows=rows, header=True))
+
+			report_content = self.generate_document('KovaaK\'s Stat Dashboard', doc.getvalue())
+
+		with self.timer.stage('render charts'):
+			wait_charts(lambda done, total: f_progress(done, total, 'Rendering charts'), cancel_event)
+			chart_cache.export(chart_jobs)
+			chart_cache.prune()
+
+		if TIMING_SECTION_MARK in report_content:
+			report_content = report_content.replace(TIMING_SECTION_MARK, self.generate_timing_section())
+
+		return report_content
+
+	# update_in_place: if True, the stable dashboard folder is used instead of a new timestamped one
+	def create_folders(self, update_in_place = False):
+		if update_in_place:
+			report_folder_name = DASHBOARD_FOLDERNAME
+		else:
+			report_folder_name = f'{DASHBOARD_FOLDERNAME}_{datetime.now().isoformat().replace(":","_").replace("T","_")}'
+
+		self.report_folder_path = os.path.join(self.cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS), report_folder_name)
+		self.resources_folder_path = os.path.join(self.report_folder_path, REPORT_RESOURCES_FOLDERNAME)
+
+		os.makedirs(self.resources_folder_path, exist_ok=update_in_place)
+
+	# returns seconds as hours and minutes (ex: 12h 05m)
+	@staticmethod
+	def format_duration(seconds):
+		minutes = int(seconds // 60)
+		return f'{minutes // 60}h {minutes % 60:02d}m'
@@ -0,0 +1,57 @@
+import numpy as np
+
+from models.statsengine import get_local_days
+
+# downsamplers, they only apply to series longer than the target number of points
+# (data_x are timestamps in epoch seconds, sorted)
+
+# returns the indices of the target_n points kept by largest triangle three buckets
+# the first and last points are always kept, every bucket in between keeps the point forming the largest
+# triangle with the point kept in the previous bucket and the average of the next bucket
+def lttb_indices(data_x, data_y, target_n):
+	data_x = np.asarray(data_x, dtype=np.float64)
+	data_y = np.asarray(data_y, dtype=np.float64)
+	n = len(data_x)
+	if target_n >= n or target_n < 3:
+		return np.arange(n)
+
+	# bucket bounds of the n - 2 inner points, target_n - 2 buckets
+	bounds = np.floor(np.linspace(1, n - 1, target_n - 1)).astype(np.int64)
+
+	# averages of every bucket, the last point is the "next bucket" of the last one
+	cumsum_x = np.concatenate(([0.0], np.cumsum(data_x)))
+	cumsum_y = np.concatenate(([0.0], np.cumsum(data_y)))
+	counts = bounds[1:] - bounds[:-1]
+	avg_x = np.append((cumsum_x[bounds[1:]] - cumsum_x[bounds[:-1]]) / counts, data_x[-1])
+	avg_y = np.append((cumsum_y[bounds[1:]] - cumsum_y[bounds[:-1]]) / counts, data_y[-1])
+
+	indices = np.empty(target_n, dtype=np.int64)
+	indices[0] = 0
+	indices[-1] = n - 1
+
+	a = 0
+	for i in range(target_n - 2):
+		start, end = bounds[i], bounds[i+1]
+		x, y = data_x[start:end], data_y[start:end]
+
+		# doubled triangle areas of every point of the bucket
+		areas = np.abs((data_x[a] - avg_x[i+1]) * (y - data_y[a]) - (data_x[a] - x) * (avg_y[i+1] - data_y[a]))
+		a = start + int(np.argmax(areas))
+		indices[i+1] = a
+
+	return indices
+
+# returns the mean timestamp and value of every local day with values
+def daily_means(data_x, data_y):
+	data_x = np.asarray(data_x, dtype=np.int64)
+	data_y = np.asarray(data_y, dtype=np.float64)
+	if len(data_x) == 0:
+		return data_x, data_y
+
+	days = get_local_days(data_x)
+	starts = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1))
+	counts = np.diff(np.append(starts, len(days)))
+
+	x = np.round(np.add.reduceat(data_x, starts) / counts).astype(np.int64)
+	y = np.add.reduceat(data_y, starts) / counts
+	return x, y
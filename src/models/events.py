@@ -0,0 +1,147 @@
+import json
+
+import numpy as np
+
+# the kill events block (block 0) and the weapons block (block 1) start with these headers
+KILL_EVENTS_HEADER_MARK = b'Kill #,'
+WEAPONS_HEADER_MARK = b'\nWeapon,'
+CHALLENGE_START_MARK = b'\nChallenge Start:,'
+
+SECONDS_PER_DAY = 24*60*60
+
+# stored dtypes of the kill event and weapon columns
+KILL_COLUMNS = {
+	'kill_times': np.float32,
+	'ttks': np.float32,
+	'shots': np.int32,
+	'hits': np.int32,
+	'damage_done': np.float32,
+}
+WEAPON_COLUMNS = {
+	'weapon_shots': np.int32,
+	'weapon_hits': np.int32,
+	'weapon_damage': np.float32,
+}
+
+# returns the seconds since midnight of a HH:MM:SS.mmm timestamp
+def parse_time_of_day(value):
+	hours, minutes, seconds = value.split(':')
+	return int(hours)*3600 + int(minutes)*60 + float(seconds)
+
+# returns the lines of the block that starts at the given header mark, header excluded
+def get_block_lines(content, header_mark):
+	start = content.find(header_mark)
+	if start < 0:
+		return None
+
+	end = content.find(b'\n\n', start)
+	if end < 0:
+		end = len(content)
+
+	lines = content[start:end].lstrip(b'\n').decode('utf-8').splitlines()
+	return lines[0].split(','), [line for line in lines[1:] if len(line) > 0]
+
+# kill events and weapons of a single run, stored as columns (struct of arrays)
+# kill columns, one value per kill:
+#	kill_times: seconds since the challenge start
+#	ttks: time to kill in seconds
+#	shots, hits, damage_done
+# weapon columns, one value per weapon:
+#	weapon_names, weapon_shots, weapon_hits, weapon_damage
+class RunEvents:
+	def __init__(self, columns, weapon_names):
+		self._columns = columns
+		self._weapon_names = weapon_names
+
+	def get_column(self, key):
+		return self._columns[key]
+
+	def get_kill_times(self):
+		return self._columns['kill_times']
+
+	def get_ttks(self):
+		return self._columns['ttks']
+
+	def get_weapon_names(self):
+		return self._weapon_names
+
+	def get_kills_n(self):
+		return len(self._columns['ttks'])
+
+	# returns (path, *column blobs, weapon names as json), the row stored in the stats cache
+	def to_row(self, scen_path):
+		blobs = [np.ascontiguousarray(self._columns[key], dtype=dtype).tobytes() for key, dtype in {**KILL_COLUMNS, **WEAPON_COLUMNS}.items()]
+		return (scen_path, *blobs, json.dumps(self._weapon_names))
+
+	def __len__(self):
+		return self.get_kills_n()
+
+	def __repr__(self):
+		return f'RunEvents({self.get_kills_n()} kills, {len(self._weapon_names)} weapons)'
+
+	@staticmethod
+	def from_row(row):
+		keys = list({**KILL_COLUMNS, **WEAPON_COLUMNS}.items())
+		columns = {key: np.frombuffer(blob, dtype=dtype) for (key, dtype), blob in zip(keys, row[1:1+len(keys)])}
+		return RunEvents(columns, json.loads(row[1+len(keys)]))
+
+	# parses the kill events and weapons blocks of the content of a stat file
+	# returns None if the blocks cannot be found or parsed
+	@staticmethod
+	def from_content(content):
+		content = content.replace(b'\r\n', b'\n')
+
+		try:
+			kills_block = get_block_lines(content, KILL_EVENTS_HEADER_MARK)
+			weapons_block = get_block_lines(content, WEAPONS_HEADER_MARK)
+		except UnicodeDecodeError:
+			return None
+
+		if kills_block is None or weapons_block is None:
+			return None
+
+		try:
+			header, lines = kills_block
+			table = [line.split(',') for line in lines]
+			i_time, i_ttk, i_shots, i_hits, i_damage = [header.index(key) for key in ['Timestamp', 'TTK', 'Shots', 'Hits', 'Damage Done']]
+
+			times = np.array([parse_time_of_day(row[i_time]) for row in table], dtype=np.float64)
+			columns = {
+				'ttks': np.array([row[i_ttk].rstrip('s') for row in table], dtype=np.float64).astype(np.float32),
+				'shots': np.array([row[i_shots] for row in table], dtype=np.int64).astype(np.int32),
+				'hits': np.array([row[i_hits] for row in table], dtype=np.int64).astype(np.int32),
+				'damage_done': np.array([row[i_damage] for row in table], dtype=np.float64).astype(np.float32),
+			}
+
+			# kill times relative to the challenge start, or to the first kill if missing
+			start = content.find(CHALLENGE_START_MARK)
+			if start >= 0:
+				end = content.find(b'\n', start + len(CHALLENGE_START_MARK))
+				t0 = parse_time_of_day(content[start + len(CHALLENGE_START_MARK): end].decode('utf-8').strip())
+			else:
+				t0 = times[0] - columns['ttks'][0] if len(times) > 0 else 0
+			columns['kill_times'] = ((times - t0) % SECONDS_PER_DAY).astype(np.float32)
+
+			header, lines = weapons_block
+			table = [line.split(',') for line in lines]
+			i_name, i_shots, i_hits, i_damage = [header.index(key) for key in ['Weapon', 'Shots', 'Hits', 'Damage Done']]
+
+			weapon_names = [row[i_name] for row in table]
+			columns['weapon_shots'] = np.array([row[i_shots] for row in table], dtype=np.int64).astype(np.int32)
+			columns['weapon_hits'] = np.array([row[i_hits] for row in table], dtype=np.int64).astype(np.int32)
+			columns['weapon_damage'] = np.array([row[i_damage] for row in table], dtype=np.float64).astype(np.float32)
+		except (ValueError, IndexError, UnicodeDecodeError):
+			return None
+
+		return RunEvents(columns, weapon_names)
+
+	# reads the kill events and weapons of a stat file, returns None if they cannot be parsed
+	@staticmethod
+	def from_file(scen_path):
+		try:
+			with open(scen_path, 'rb') as fp:
+				content = fp.read()
+		except OSError:
+			return None
+
+		return RunEvents.from_content(content)
@@ -0,0 +1,174 @@
+from datetime import datetime
+
+import numpy as np
+
+from models.scenario import SUMMARY_KEYS, TARGETS_AVALIABLE, TARGET_KEYS
+from models.scenario import TARGET_SHOTS, TARGET_ACCURACY
+from models.sensitivity import get_cm360, DEFAULT_MOUSE_DPI
+from util.exceptions import ModeSelectionException
+
+# merge modes used when grouping runs, for dates, times and data
+MERGE_MIN = 0
+MERGE_MAX = 1
+MERGE_AVERAGE = 2
+MERGE_MODES = [MERGE_MIN, MERGE_MAX, MERGE_AVERAGE]
+
+# sensitivity of every run in cm/360, from the settings block, see models.sensitivity
+SENS_KEY = 'sens_cm360'
+
+# columns of a history, the summary keys and the normalized sensitivity
+HISTORY_KEYS = SUMMARY_KEYS + [SENS_KEY]
+
+# returns the index of the first run of every group, for sorted timestamps
+# a group holds every run up to threshold seconds after its first run
+def get_group_starts(timestamps, threshold):
+	n = len(timestamps)
+	if n == 0:
+		return np.empty(0, dtype=np.int64)
+
+	# a gap longer than the threshold always starts a new group
+	block_starts = np.concatenate(([0], np.flatnonzero(np.diff(timestamps) > threshold) + 1))
+	block_ends = np.append(block_starts[1:], n)
+	block_spans = timestamps[block_ends - 1] - timestamps[block_starts]
+	if np.all(block_spans <= threshold):
+		return block_starts
+
+	# blocks of continuous play longer than the threshold are split from their first run
+	starts = []
+	for start, end, span in zip(block_starts.tolist(), block_ends.tolist(), block_spans.tolist()):
+		starts.append(start)
+		if span <= threshold:
+			continue
+
+		i = start
+		while True:
+			i = int(np.searchsorted(timestamps, timestamps[i] + threshold, side='right'))
+			if i >= end:
+				break
+			starts.append(i)
+
+	return np.array(starts, dtype=np.int64)
+
+# holds all the runs of one scenario as columns
+# timestamps: int64 epoch seconds, sorted
+# columns: one float64 array per HISTORY_KEYS key, missing values are nan
+class ScenarioHistory:
+	def __init__(self, name, timestamps, columns):
+		self._name = name
+		self._timestamps = timestamps
+		self._columns = columns
+
+	def get_name(self):
+		return self._name
+
+	def get_timestamps(self):
+		return self._timestamps
+
+	def get_datetimes(self):
+		return [datetime.fromtimestamp(t) for t in self._timestamps.tolist()]
+
+	def get_columns(self):
+		return self._columns
+
+	def get_column(self, key):
+		return self._columns[key]
+
+	# returns the values of a target for every run
+	def get_target(self, target):
+		if target not in TARGETS_AVALIABLE:
+			raise ValueError(f'Invalid Target: {target} @ ScenarioHistory.get_target')
+
+		if target == TARGET_SHOTS:
+			return self.get_column('hit_count') + self.get_column('miss_count')
+		elif target == TARGET_ACCURACY:
+			with np.errstate(divide='ignore', invalid='ignore'):
+				return self.get_column('hit_count') / self.get_target(TARGET_SHOTS)
+
+		return self.get_column(TARGET_KEYS[target])
+
+	# returns a new history with the selected runs (slice, index array or boolean mask)
+	def select(self, selection):
+		columns = {key: values[selection] for key, values in self._columns.items()}
+		return ScenarioHistory(self._name, self._timestamps[selection], columns)
+
+	# returns a new history with the runs merged into groups of hours_n hours
+	# for the date, time and data modes:
+	# MERGE_MIN: min value of the group
+	# MERGE_MAX: max value of the group
+	# MERGE_AVERAGE: average of the group (the data becomes float)
+	def group_sessions(self, hours_n, date_mode = None, time_mode = None, data_mode = None):
+		for mode_name, mode in [('date_mode', date_mode), ('time_mode', time_mode), ('data_mode', data_mode)]:
+			if mode is None:
+				raise ModeSelectionException(f'No {mode_name} selected')
+			elif mode not in MERGE_MODES:
+				raise ModeSelectionException(f'Invalid {mode_name}: {mode}')
+
+		if len(self) == 0:
+			return self
+
+		starts = get_group_starts(self._timestamps, hours_n*60*60)
+		counts = np.diff(np.append(starts, len(self)))
+
+		# timestamps
+		timestamps_by_mode = {
+			MERGE_MIN: self._timestamps[starts],
+			MERGE_MAX: self._timestamps[starts + counts - 1],
+		}
+		if MERGE_AVERAGE in (date_mode, time_mode):
+			timestamps_by_mode[MERGE_AVERAGE] = np.round(np.add.reduceat(self._timestamps, starts) / counts).astype(np.int64)
+
+		if date_mode == time_mode:
+			timestamps = timestamps_by_mode[date_mode]
+		else:
+			# date of one timestamp, time of another
+			dates = [datetime.fromtimestamp(t).date() for t in timestamps_by_mode[date_mode].tolist()]
+			times = [datetime.fromtimestamp(t).time() for t in timestamps_by_mode[time_mode].tolist()]
+			timestamps = np.array([datetime.combine(d, t).timestamp() for d, t in zip(dates, times)], dtype=np.int64)
+
+		# data
+		columns = dict()
+		for key, values in self._columns.items():
+			if data_mode == MERGE_MIN:
+				columns[key] = np.minimum.reduceat(values, starts)
+			elif data_mode == MERGE_MAX:
+				columns[key] = np.maximum.reduceat(values, starts)
+			elif data_mode == MERGE_AVERAGE:
+				columns[key] = np.add.reduceat(values, starts) / counts
+
+		return ScenarioHistory(self._name, timestamps, columns)
+
+	def __len__(self):
+		return len(self._timestamps)
+
+	def __repr__(self):
+		return f'ScenarioHistory:{self._name}({len(self)})'
+
+	@staticmethod
+	def empty(name):
+		return ScenarioHistory(name, np.empty(0, dtype=np.int64), {key: np.empty(0) for key in HISTORY_KEYS})
+
+	# builds a history from value rows: (timestamp, *values of HISTORY_KEYS)
+	@staticmethod
+	def from_rows(name, rows):
+		if len(rows) == 0:
+			return ScenarioHistory.empty(name)
+
+		# None values become nan
+		table = np.array(rows, dtype=np.float64)
+		order = np.argsort(table[:, 0], kind='stable')
+		table = table[order].T.copy()
+
+		timestamps = table[0].astype(np.int64)
+		columns = {key: table[i+1] for i, key in enumerate(HISTORY_KEYS)}
+		return ScenarioHistory(name, timestamps, columns)
+
+	@staticmethod
+	def from_scenarios(name, scenarios, mouse_dpi = DEFAULT_MOUSE_DPI):
+		datas = [scen.get_data() for scen in scenarios]
+		cm360 = get_cm360([data.get('sens_scale') for data in datas], [data.get('horiz_sens', np.nan) for data in datas], mouse_dpi)
+
+		rows = []
+		for scen, data, sens in zip(scenarios, datas, cm360.tolist()):
+			rows.append((scen.get_timestamp().timestamp(), *[data.get(key) for key in SUMMARY_KEYS], sens))
+
+		return ScenarioHistory.from_rows(name, rows)
@@ -0,0 +1,86 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from models.scenario import Scenario
+from models.scenario import SUMMARY_KEYS, SETTINGS_KEYS
+import util.utilities as utilities
+
+INGEST_CHUNK_SIZE = 256
+
+# below this number of files a process pool costs more than it saves
+INGEST_PARALLEL_THRESHOLD = 1024
+
+# parses a single stat file into a compact record
+# record: (path, name, timestamp as epoch seconds, *values of SUMMARY_KEYS, *values of SETTINGS_KEYS)
+# returns None if the file cannot be parsed (ex: still being written)
+def parse_stat_file(scen_path):
+	try:
+		scen = Scenario.from_file(scen_path)
+	except (OSError, ValueError, IndexError):
+		return None
+
+	# a file without a summary block (score included) is still being written
+	data = scen.get_data()
+	if 'score' not in data:
+		return None
+
+	values = [data.get(key) for key in SUMMARY_KEYS + SETTINGS_KEYS]
+	return (scen_path, scen.get_name(), int(scen.get_timestamp().timestamp()), *values)
+
+# worker entry point, parses a chunk of stat files
+def parse_stat_chunk(scen_paths):
+	records = [parse_stat_file(scen_path) for scen_path in scen_paths]
+	return [record for record in records if record is not None]
+
+# parses many stat files, fanning them out in chunks across a process pool
+# f_progress is called as f_progress(files_done, files_total) after every chunk
+# when cancel_event (threading.Event) is set, the remaining chunks are dropped and ReportCancelledException is raised
+# returns the list of parsed records, in no particular order
+def parse_stat_files(scen_paths, max_workers = None, chunk_size = INGEST_CHUNK_SIZE, f_progress = None, cancel_event = None):
+	return parse_files(parse_stat_chunk, scen_paths, max_workers, chunk_size, f_progress, cancel_event)
+
+# worker entry point, parses the kill events and weapons of a chunk of stat files
+# returns a list of (path, RunEvents)
+def parse_events_chunk(scen_paths):
+	# imported here, numpy is not needed to parse the summaries
+	from models.events import RunEvents
+
+	records = [(scen_path, RunEvents.from_file(scen_path)) for scen_path in scen_paths]
+	return [record for record in records if record[1] is not None]
+
+# parses the kill events and weapons of many stat files, see parse_stat_files
+def parse_event_files(scen_paths, max_workers = None, chunk_size = INGEST_CHUNK_SIZE, f_progress = None, cancel_event = None):
+	return parse_files(parse_events_chunk, scen_paths, max_workers, chunk_size, f_progress, cancel_event)
+
+# runs f_chunk (a module level function, so it can be sent to the workers) over chunks of the given files
+# returns the concatenated lists returned by f_chunk, in no particular order
+def parse_files(f_chunk, scen_paths, max_workers = None, chunk_size = INGEST_CHUNK_SIZE, f_progress = None, cancel_event = None):
+	total = len(scen_paths)
+	chunks = [scen_paths[i: i+chunk_size] for i in range(0, total, chunk_size)]
+
+	records = []
+	done = 0
+	if total < INGEST_PARALLEL_THRESHOLD or max_workers == 1 or (os.cpu_count() or 1) == 1:
+		for chunk in chunks:
+			utilities.check_cancelled(cancel_event)
+			records.extend(f_chunk(chunk))
+			done += len(chunk)
+			if f_progress is not None:
+				f_progress(done, total)
+
+		return records
+
+	with ProcessPoolExecutor(max_workers=max_workers) as executor:
+		futures = {executor.submit(f_chunk, chunk): len(chunk) for chunk in chunks}
+		for future in as_completed(futures):
+			# the queued chunks are dropped, the ones already running are left to finish
+			if cancel_event is not None and cancel_event.is_set():
+				executor.shutdown(cancel_futures=True)
+				utilities.check_cancelled(cancel_event)
+
+			records.extend(future.result())
+			done += futures[future]
+			if f_progress is not None:
+				f_progress(done, total)
+
+	return records
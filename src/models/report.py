@@ -1,29 +1,49 @@
 import os
 import io
-from datetime import datetime, date, timedelta
+import json
+import shutil
+from datetime import datetime
 
 import numpy as np
-from matplotlib import pyplot as plt
-import matplotlib.patheffects as pe
-from scipy.interpolate import PchipInterpolator
 
 import yattag
 import cssmin
 
-from models.scenario import Scenario
 from models.scenario import TARGET_SCORE
+from models.history import MERGE_MIN, MERGE_AVERAGE, SENS_KEY
+import models.sensitivity as sensitivity
+import models.statsengine as statsengine
+import models.smoothing as smoothing
+import models.downsampling as downsampling
+import models.charts as charts
+from models.statsindex import StatsIndex
+from models.statscache import StatsCache
+from models.chartcache import ChartCache
 import models.config as ckeys
 from models.config import Config
+from util.exceptions import ModeSelectionException, ReportCancelledException
+import util.utilities as utilities
+import util.timing as timing
 
 CHAR_DELTA = '\u0394'
 CHAR_TRIANGLE = '\u2BC8'
-CHAR_TRIANGLE_SMALL_UP = '\u25B4'
-CHAR_TRIANGLE_SMALL_DOWN = '\u25BE'
 
 REPORT_RESOURCES_FOLDERNAME = 'report_resources'
 REPORT_FILENAME = 'KSV_report.html'
 CSS_FILENAME = 'style.css'
 
+# update in place reports: one stable folder per playlist, with a manifest of the rendered sections
+REPORT_FOLDERNAME_PREFIX = 'KSV_report_'
+REPORT_MANIFEST_FILENAME = 'manifest.json'
+# bump when the section html or charts change, so old sections are not reused
+REPORT_MANIFEST_VERSION = 3
+
+# replaced by the timing section once the whole report has been generated
+TIMING_SECTION_MARK = '<!-- KSV_TIMING_SECTION -->'
+
+# weeks listed in the weekly stats table of every scenario
+REPORT_WEEKS_SHOWN = 4
+
 CSS_REPLACER_MARK = '$REPLACEME$'
 CSS_REPLACER_COLOR_BG = 'COLOR-BG'
 CSS_REPLACER_COLOR_TEXT = 'COLOR-TEXT'
@@ -32,218 +52,607 @@ CSS_REPLACER_COLOR_MAIN = 'COLOR-MAIN'
 CSS_REPLACER_COLOR_SECONDARY = 'COLOR-SECONDARY'
 
 class Report:
-	def __init__(self, playlist, cfg: Config):
+	# stats_index: an already built index to reuse (ex: kept up to date by a StatsWatcher)
+	# stats_histories: dict scenario name -> ScenarioHistory shared between reports of the same days window,
+	#                  loaded histories are added to it so each scenario is loaded once (ex: many playlists at once)
+	def __init__(self, playlist, cfg: Config, stats_index = None, stats_histories = None):
 		self.playlist = playlist
 		self.cfg = cfg
 
 		self.report_folder_path = None
 		self.resources_folder_path = None
 
+		self.stats_index = stats_index
+		self.stats_cache = None
+		self.stats_histories = stats_histories
+
+		# manifest of the update in place mode, None when a new report folder is created
+		self.manifest = None
+
+		# stage timers, they cost nothing when timing is disabled
+		self.timer = timing.StageTimer(enabled=cfg.get_option(ckeys.OPTIONKEY_TIMING_CHECK) or cfg.get_option(ckeys.OPTIONKEY_TIMING_IN_REPORT_CHECK))
+
+	# returns the stats folder index, the folder is only listed once per report
+	def get_stats_index(self):
+		if self.stats_index is None:
+			self.stats_index = StatsIndex(self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS))
+
+		return self.stats_index
+
+	def get_stats_cache(self):
+		if self.stats_cache is None:
+			self.stats_cache = StatsCache.from_config(self.cfg)
+
+		return self.stats_cache
+
 	# Loads the stats for a given scenario, up to days_n number of days
 	# if days_n is None, then loads all stats
 	def load_scenario_stats(self, scenario_name, days_n = None):
-		scenarios = []
-		for fname in os.listdir(self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS)):
-			scen_path = os.path.join(self.cfg.get_path(ckeys.PATHKEY_KOVAAKS_STATS), fname)
-			scen = Scenario(scen_path)
-
-			if scen.get_name() == scenario_name:
-				if days_n is None:
-					scenarios.append(scen)
-				else:
-					days_delta = abs((scen.get_timestamp().date() - date.today()).days)
-					if days_delta <= days_n:
-						scenarios.append(scen)
-
-		return scenarios
+		return self.load_playlist_stats([scenario_name], days_n)[scenario_name]
+
+	# Loads the stats of many scenarios at once, up to days_n number of days
+	# the stats folder is listed once and all files are answered by a single cache query,
+	# name and date filters are applied on the filenames and only cache misses are parsed
+	# f_progress is called as f_progress(files_done, files_total) while parsing cache misses
+	# when cancel_event is set, the parsing stops and ReportCancelledException is raised
+	# returns a dict scenario name -> ScenarioHistory
+	def load_playlist_stats(self, scenarios_names, days_n = None, f_progress = None, cancel_event = None):
+		if self.stats_histories is None:
+			self.stats_histories = dict()
+
+		index = self.get_stats_index()
+		paths_by_name = {name: index.get_paths(name, days_n) for name in scenarios_names if name not in self.stats_histories}
+		if len(paths_by_name) > 0:
+			self.stats_histories.update(self.get_stats_cache().get_histories(index, paths_by_name, f_progress, self.cfg.get_option(ckeys.OPTIONKEY_MOUSE_DPI_NUMBER), cancel_event))
+
+		return {name: self.stats_histories[name] for name in scenarios_names}
+
+	# Loads the kill events of the runs of many scenarios, up to days_n number of days
+	# only files never deep parsed before are read
+	# returns a dict scenario name -> list of (timestamp, RunEvents), in run order
+	def load_playlist_events(self, scenarios_names, days_n = None, f_progress = None, cancel_event = None):
+		index = self.get_stats_index()
+		entries_by_name = {name: index.get_entries(name, days_n) for name in scenarios_names}
+		all_paths = [scen_path for entries in entries_by_name.values() for _, scen_path in entries]
+		events = self.get_stats_cache().get_events(all_paths, f_progress, cancel_event)
+
+		return {name: [(timestamp, events[scen_path]) for timestamp, scen_path in entries if scen_path in events] for name, entries in entries_by_name.items()}
 
 	# returns the x,y data for a given target
 	# where:	x are datetime
 	#			y are int/float
-	def make_plottable_data(self, scenario_list, target):
-		x = [sce.get_timestamp() for sce in scenario_list]
-		y = [sce.get_data_target(target) for sce in scenario_list]
+	def make_plottable_data(self, history, target):
+		x = history.get_datetimes()
+		y = history.get_target(target)
 		return x,y
 
-	def get_data_values(self, data_y):
+	# returns the statistics of a series, rounded for the report tables, see models.statsengine.get_stats
+	# data_x: timestamps (epoch seconds)
+	# quantiles are also kept unrounded, they are the y ticks of the chart
+	def make_stats_values(self, data_x, data_y):
+		stats = statsengine.get_stats(data_x, data_y)
+
 		data = dict()
-		data['max'] = round(max(data_y))
-		data['min'] = round(min(data_y))
+		data['max'] = round(stats['max'])
+		data['min'] = round(stats['min'])
 
-		data['avg'] = round(np.mean(data_y))
-		data['std'] = round(np.std(data_y), 3)
+		data['avg'] = round(stats['mean'])
+		data['std'] = round(stats['std'], 3)
 
-		return data
+		data['p25'], data['median'], data['p75'] = [round(q) for q in stats['quantiles'][1:4]]
+		data['trend'] = round(stats['slope'], 2)
+		data['recent'] = round(stats['recent_delta'], 1)
+		data['quantiles'] = stats['quantiles']
 
-	def make_averaged_data(self, data_y, average_sessions = 1):
-		data_y_average = []
+		return data
 
-		i = 0
-		while i < len(data_y):
-			j = max(i - (average_sessions - 1), 0)
-			data_slice = data_y[j: i+1]
-			y_avg = np.mean(data_slice)
-			data_y_average.append(y_avg)
-			i += 1
+	# returns the runs, best and average score of the last weeks, the most recent first
+	# rows: one (week start, runs, best, avg) per played week
+	def make_weekly_data(self, history):
+		weekly = statsengine.get_weekly_stats(history.get_timestamps(), history.get_target(TARGET_SCORE))
+		if weekly is None:
+			return None
+
+		rows = []
+		for start, runs, best, mean in list(zip(*[weekly[key].tolist() for key in ['start', 'runs', 'best', 'mean']]))[:REPORT_WEEKS_SHOWN]:
+			week = charts.get_epoch_dates([start])[0]
+			rows.append((week.strftime('%d-%m-%y'), runs, round(best), round(mean)))
+
+		return rows
+
+	# returns the trailing average of data_y over the last average_sessions values
+	# mode: one of the SMOOTHING_MODES, if None the configured mode is used
+	def make_averaged_data(self, data_y, average_sessions = 1, mode = None):
+		if mode is None:
+			mode = self.cfg.get_option(ckeys.OPTIONKEY_SMOOTHING_MODE)
+
+		if mode == ckeys.SMOOTHING_MODE_MEAN:
+			return smoothing.rolling_mean(data_y, average_sessions)
+		elif mode == ckeys.SMOOTHING_MODE_EWM:
+			return smoothing.exponential_mean(data_y, average_sessions)
+		elif mode == ckeys.SMOOTHING_MODE_MEDIAN:
+			return smoothing.rolling_median(data_y, average_sessions)
+		else:
+			raise ModeSelectionException(f'Invalid smoothing mode: {mode}')
+
+	# returns the points of a series that are plotted, at most target_n of them
+	# data_x: timestamps (epoch seconds), sorted
+	# data_y_avg: averages of data_y computed on the whole series, the same points are kept (None if not plotted)
+	# mode: one of the DOWNSAMPLE_MODES, if None the configured mode is used
+	#       DOWNSAMPLE_MODE_LTTB keeps the points that preserve the shape of the series
+	#       DOWNSAMPLE_MODE_DAILY averages the points of every day, then falls back to lttb if there are still too many
+	# series of target_n points or less are returned unchanged
+	# returns (data_x, data_y, data_y_avg)
+	def make_downsampled_data(self, data_x, data_y, data_y_avg = None, target_n = None, mode = None):
+		if mode is None:
+			mode = self.cfg.get_option(ckeys.OPTIONKEY_DOWNSAMPLE_MODE)
+		if target_n is None:
+			target_n = self.cfg.get_option(ckeys.OPTIONKEY_DOWNSAMPLE_NUMBER)
+
+		if mode not in ckeys.DOWNSAMPLE_MODES:
+			raise ModeSelectionException(f'Invalid downsample mode: {mode}')
+
+		if mode == ckeys.DOWNSAMPLE_MODE_NONE or len(data_x) <= target_n:
+			return data_x, data_y, data_y_avg
+
+		if mode == ckeys.DOWNSAMPLE_MODE_DAILY:
+			if data_y_avg is not None:
+				_, data_y_avg = downsampling.daily_means(data_x, data_y_avg)
+			data_x, data_y = downsampling.daily_means(data_x, data_y)
 
-		return data_y_average
+		# the indices are picked on the values, the averages follow the same points
+		indices = downsampling.lttb_indices(data_x, data_y, target_n)
+		return data_x[indices], data_y[indices], data_y_avg[indices] if data_y_avg is not None else None
 
-	# returns a list of scenarios merged by a hourly threshold
+	# returns a history with the runs merged by a hourly threshold
 	# hours_n recommended to be set as: 24/times_trained_a_day
 	#         ex: if you train 3 times a day: 24/3 = 8
 	#         floats quotients are accepted (ex: 24/5)
-	def group_sessions(self, scenario_list, hours_n):
-		threshold = hours_n*60*60
-		i, j = 0, 0
-		scenarios_merged = []
-		while i < len(scenario_list):
-			j = i
-			scen0 = scenario_list[i]
-			scen1 = scen0
-			while j< len(scenario_list) and abs((scenario_list[j].get_timestamp() - scen0.get_timestamp()).total_seconds()) <= threshold:
-				j += 1
-
-			scen_merged = Scenario.merge_scenarios(scenario_list[i:j], 0, 0, 2)
-			scenarios_merged.append(scen_merged)
-
-			i = j
+	def group_sessions(self, history, hours_n):
+		return history.group_sessions(hours_n, MERGE_MIN, MERGE_MIN, MERGE_AVERAGE)
 
-		return scenarios_merged
-
-	# plots a graph of one scenario
+	# returns the render job of the graph of one scenario, see models.charts
 	# data_x: datetimes
 	# data_y: scores or target value
 	# data_y_avg: averages over time of data_y
 	# data_y_values: statistical values of data_y (min, max, etc)
-	def plot(self, data_x, data_y, data_y_avg = None, data_y_values = None, scenario_name = None, folder_path = None):
+	# data_y_quantiles: STATS_QUANTILES of data_y, the y ticks, computed from data_y if None
+	def make_chart_job(self, data_x, data_y, data_y_avg = None, data_y_values = None, scenario_name = None, folder_path = None, data_y_quantiles = None):
 		if data_y_values is None or scenario_name is None or folder_path is None:
 			raise ValueError('data_y_values, scenario_name, folder_path cannot be None!')
 
-		if len(data_x) >= 2:
-			# smooth x data
-			x_floats = [date.timestamp() for date in data_x]
-			x_smooth_floats = np.linspace(x_floats[0], x_floats[-1], 500)
-			x_smooth = [datetime.fromtimestamp(t) for t in x_smooth_floats]
-			
-			# score curve
-			interpolated_score = PchipInterpolator(x_floats, data_y)
-			y_smooth = interpolated_score(x_smooth_floats)
-
-			# average curve
-			if data_y_avg is not None:
-				interpolated_avg = PchipInterpolator(x_floats, data_y_avg)
-				y_smooth_avg = interpolated_avg(x_smooth_floats)
-
-		fig, ax = plt.subplots(figsize=(10, 5))
-
-		# plot week lines
-		min_x = min(data_x)
-		x = max(data_x) - timedelta(days=7)
-		while x > min_x:
-			ax.axvline(x=x, linestyle=(0, (5, 5)), color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_WEEKLINE), alpha=0.3, linewidth=0.75)
-			x = x - timedelta(days=7)
-
-		# plot max and min
-		min_y = data_y_values['min']
-		max_y = data_y_values['max']
-		ax.axhline(y=min_y, linestyle=(0, (5, 5)), color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_MIN), alpha=0.5, linewidth=0.75, xmin=min(data_x))
-		ax.axhline(y=max_y, linestyle=(0, (5, 5)), color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_MAX), alpha=0.5, linewidth=0.75, xmin=min(data_x))
-
-		# plot curves
-		if len(data_x) >= 2:
-			ax.plot(x_smooth, y_smooth, '-', color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_SCORECURVE))
-
-			if data_y_avg is not None:
-				ax.plot(x_smooth, y_smooth_avg, '--', color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_AVERAGECURVE))
+		job = dict()
+		job['data_x'] = np.array([d.timestamp() for d in data_x])
+		job['data_y'] = np.asarray(data_y)
+		job['data_y_avg'] = np.asarray(data_y_avg) if data_y_avg is not None else None
+		job['data_y_values'] = data_y_values
+		job['data_y_quantiles'] = data_y_quantiles if data_y_quantiles is not None else statsengine.get_stats(job['data_x'], job['data_y'])['quantiles']
+		job['graphs'] = dict(self.cfg.get_data()[ckeys.SECTION_GRAPHS])
+		job['percentages'] = self.cfg.get_option(ckeys.OPTIONKEY_PERCENTAGES_CHECK) and self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK)
+		job['fpath'] = os.path.join(folder_path, f'{scenario_name}.png')
+		return job
+
+	# plots a graph of one scenario, returns the image path
+	def plot(self, data_x, data_y, data_y_avg = None, data_y_values = None, scenario_name = None, folder_path = None):
+		job = self.make_chart_job(data_x, data_y, data_y_avg, data_y_values, scenario_name, folder_path)
+		return charts.render_chart(job)
+
+	# returns the kill stats of one scenario, from the kill events of its runs, or None if no kill was found
+	# events: y_values (ttk quantiles, consistency, kills), weapons (name -> accuracy), chart_job
+	def make_events_data(self, scenario_name, runs):
+		runs = [(timestamp, run_events) for timestamp, run_events in runs if len(run_events) > 0]
+		if len(runs) == 0:
+			return None
+
+		# per run ttk distribution, the spread between p10 and p90 shows the consistency of a run
+		ttks = [run_events.get_ttks().astype(np.float64) for _, run_events in runs]
+		run_quantiles = np.array([np.percentile(run_ttks, [10, 50, 90]) for run_ttks in ttks])
+		run_cvs = np.array([np.std(run_ttks) / np.mean(run_ttks) if np.mean(run_ttks) > 0 else np.nan for run_ttks in ttks])
+
+		all_ttks = np.concatenate(ttks)
+		p10, p50, p90 = np.percentile(all_ttks, [10, 50, 90])
+
+		y_values = dict()
+		y_values['median'] = round(float(p50), 3)
+		y_values['p10'] = round(float(p10), 3)
+		y_values['p90'] = round(float(p90), 3)
+		y_values['cv'] = round(float(np.nanmean(run_cvs)), 3) if not np.all(np.isnan(run_cvs)) else '-'
+		y_values['kills'] = len(all_ttks)
+
+		# accuracy per weapon over all runs
+		weapon_shots = dict()
+		weapon_hits = dict()
+		for _, run_events in runs:
+			for name, shots, hits in zip(run_events.get_weapon_names(), run_events.get_column('weapon_shots').tolist(), run_events.get_column('weapon_hits').tolist()):
+				weapon_shots[name] = weapon_shots.get(name, 0) + shots
+				weapon_hits[name] = weapon_hits.get(name, 0) + hits
+
+		weapons = {name: round(weapon_hits[name] / shots * 100, 1) for name, shots in weapon_shots.items() if shots > 0}
+
+		job = dict()
+		job['kind'] = charts.CHART_KIND_TTK
+		job['data_x'] = np.array([timestamp.timestamp() for timestamp, _ in runs])
+		job['data_y'] = run_quantiles[:, 1]
+		job['data_y_avg'] = None
+		job['data_y_low'] = run_quantiles[:, 0]
+		job['data_y_high'] = run_quantiles[:, 2]
+		job['data_y_values'] = y_values
+		job['graphs'] = dict(self.cfg.get_data()[ckeys.SECTION_GRAPHS])
+		job['fpath'] = os.path.join(self.resources_folder_path, f'{scenario_name}_ttk.png')
+
+		events = dict()
+		events['y_values'] = y_values
+		events['weapons'] = weapons
+		events['chart_job'] = job
+		return events
+
+	# returns the score stats of one scenario per sens bucket, or None if no run has a known sens
+	# rows: one (sens range, runs, best, avg, p50, p90) per bucket, sorted by sens
+	def make_sens_data(self, history):
+		bucket_width = self.cfg.get_option(ckeys.OPTIONKEY_SENS_BUCKET_NUMBER)
+		if bucket_width <= 0:
+			raise ValueError(f'Invalid sens bucket width: {bucket_width}, must be positive')
+
+		# the sens of the history were converted to cm/360 with it, see load_playlist_stats
+		mouse_dpi = self.cfg.get_option(ckeys.OPTIONKEY_MOUSE_DPI_NUMBER)
+		if mouse_dpi <= 0:
+			raise ValueError(f'Invalid mouse dpi: {mouse_dpi}, must be positive')
+
+		stats = sensitivity.get_bucket_stats(history.get_column(SENS_KEY), history.get_target(TARGET_SCORE), bucket_width)
+		if stats is None:
+			return None
+
+		rows = []
+		for low, high, runs, best, avg, p50, p90 in zip(*[stats[key].tolist() for key in ['low', 'high', 'runs', 'best', 'avg', 'p50', 'p90']]):
+			rows.append((f'{low:g}-{high:g}', runs, round(best), round(avg), round(p50), round(p90)))
+
+		sens = dict()
+		sens['rows'] = rows
+		return sens
+
+	# returns the data of one scenario section, or None if the scenario was not played
+	# section: y_values, y_avg_values (None if averages are disabled), chart_job, weekly (rows of the last weeks),
+	#          events (kill stats, None if the deep parse is disabled or no kill was found),
+	#          sens (scores per sens bucket, None if disabled or no run has a known sens)
+	def make_section_data(self, scenario_name, history, runs = None):
+		if len(history) == 0:
+			return None
+
+		with self.timer.stage('group sessions'):
+			if self.cfg.get_option(ckeys.OPTIONKEY_GROUP_SESSIONS_CHECK):
+				hours_threshold = self.cfg.get_option(ckeys.OPTIONKEY_GROUP_SESSIONS_NUMBER)
+				history_plotted = self.group_sessions(history, hours_n=hours_threshold)
+			else:
+				history_plotted = history
+
+			data = self.make_plottable_data(history_plotted, target=TARGET_SCORE)
+
+		# the stats of the ungrouped runs are also the chart ticks when sessions are not grouped
+		with self.timer.stage('stats values'):
+			y_values = self.make_stats_values(history.get_timestamps(), history.get_target(TARGET_SCORE))
+			if history_plotted is history:
+				y_quantiles = y_values['quantiles']
+			else:
+				y_quantiles = statsengine.get_stats(history_plotted.get_timestamps(), data[1])['quantiles']
+
+			weekly = self.make_weekly_data(history)
+
+		# plot averages, computed on every plotted point
+		if self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK):
+			with self.timer.stage('smoothing'):
+				y_avg = self.make_averaged_data(data[1], average_sessions=5)
+				y_avg_ungrouped = self.make_averaged_data(y_avg, average_sessions=5)
+				y_avg_values = self.make_stats_values(history_plotted.get_timestamps(), y_avg_ungrouped)
 		else:
-			ax.plot(data_x, data_y, '-', color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_SCORECURVE))
-
-			if data_y_avg is not None:
-				ax.plot(data_x, data_y_avg, '--', color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_AVERAGECURVE))
-
-		# plot points
-		ax.plot(data_x, data_y, 'o', color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_SCOREDATA), label='score')
-
-		if data_y_avg is not None:
-			ax.plot(data_x, data_y_avg, 'o', color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_AVERAGEDATA), label='avg')
-
-		# ticks
-		xticks = []
-		xticks.append(data_x[0])
-		xticks.append(np.quantile(data_x, 0.25))
-		xticks.append(np.quantile(data_x, 0.5))
-		xticks.append(np.quantile(data_x, 0.75))
-		xticks.append(data_x[-1])
-		xticks_str = [d.strftime('%d-%m') for d in xticks]
+			y_avg = None
+			y_avg_values = None
+
+		# dense series are downsampled before the interpolation and annotations, so the render cost is bounded
+		with self.timer.stage('downsampling'):
+			x_plotted, y_plotted, y_avg_plotted = self.make_downsampled_data(history_plotted.get_timestamps(), np.asarray(data[1], dtype=np.float64),
+																			np.asarray(y_avg, dtype=np.float64) if y_avg is not None else None)
+			if len(x_plotted) != len(history_plotted):
+				data = ([datetime.fromtimestamp(t) for t in x_plotted.tolist()], y_plotted)
+				y_avg = y_avg_plotted
+
+		section = dict()
+		section['y_values'] = y_values
+		section['y_avg_values'] = y_avg_values
+		section['chart_job'] = self.make_chart_job(data[0], data[1], y_avg, y_values, scenario_name, self.resources_folder_path, y_quantiles)
+		section['weekly'] = weekly
+		section['events'] = self.make_events_data(scenario_name, runs) if runs is not None else None
+
+		with self.timer.stage('sens buckets'):
+			section['sens'] = self.make_sens_data(history) if self.cfg.get_option(ckeys.OPTIONKEY_SENS_CHECK) else None
+
+		return section
+
+	# returns the html of one scenario section
+	def generate_section(self, i, scenario_name, section):
+		doc, tag, text = yattag.Doc().tagtext()
 
-		yticks = []
-		yticks.append(min(data_y))
-		yticks.append(np.quantile(data_y, 0.25))
-		yticks.append(np.quantile(data_y, 0.5))
-		yticks.append(np.quantile(data_y, 0.75))
-		yticks.append(max(data_y))
-		yticks = list(set([round(y) for y in yticks]))
+		with tag('div', klass='scenario'):
+			with tag('div', klass='title'):
+				with tag('p', klass='icon'):
+					text(f'{str(i+1).zfill(2)} {CHAR_TRIANGLE}')
+				with tag('h3', klass='name'):
+					text(scenario_name)
 
-		if round(min_y) not in yticks:
-			yticks.append(min_y)
+			# if there are played scenarios, show the graph
+			if section is not None:
+				with tag('div', klass='content'):
+					img_path = section['chart_job']['fpath']
+					img_path_href = os.path.join('.', os.path.relpath(img_path, self.report_folder_path))
+					doc.stag('img', src=img_path_href, klass='graph')
+
+					with tag('div', klass='data'):
+						with tag('h4', klass='title'):
+							text('Ungrouped Stats')
+
+						doc.stag('hr', klass='data-sep')
+
+						with tag('table', klass='datatable'):
+							with tag('tbody'):
+								with tag('tr', klass='row1'):
+									with tag('td'):
+										text('')
+									with tag('td', klass='bottomborder'):
+										text('Original')
+									with tag('td', klass='bottomborder'):
+										text('Average')
+
+								with tag('tr', klass='row2'):
+									with tag('td', klass='category rightborder'):
+										text('Max')
+									with tag('td', klass='value'):
+										text(section['y_values']['max'])
+									with tag('td', klass='value'):
+										text(section['y_avg_values']['max'] if section['y_avg_values'] is not None else '-')
+
+								with tag('tr', klass='row3'):
+									with tag('td', klass='category rightborder'):
+										text('Min')
+									with tag('td', klass='value'):
+										text(section['y_values']['min'])
+									with tag('td', klass='value'):
+										text(section['y_avg_values']['min'] if section['y_avg_values'] is not None else '-')
+
+								with tag('tr', klass='row4'):
+									with tag('td', klass='category rightborder'):
+										text('Avg')
+									with tag('td', klass='value'):
+										text(section['y_values']['avg'])
+									with tag('td', klass='value'):
+										text(section['y_avg_values']['avg'] if section['y_avg_values'] is not None else '-')
+
+								with tag('tr', klass='row5'):
+									with tag('td', klass='category rightborder'):
+										text('StDev')
+									with tag('td', klass='value'):
+										text(section['y_values']['std'])
+									with tag('td', klass='value'):
+										text(section['y_avg_values']['std'] if section['y_avg_values'] is not None else '-')
+
+								# quantiles, trend per day and last runs vs all runs
+								rows = [
+									('P25', 'p25', ''),
+									('Median', 'median', ''),
+									('P75', 'p75', ''),
+									('Trend/day', 'trend', ''),
+									(f'Last {statsengine.STATS_RECENT_RUNS} {CHAR_DELTA}', 'recent', '%'),
+								]
+								for category, key, unit in rows:
+									with tag('tr'):
+										with tag('td', klass='category rightborder'):
+											text(category)
+										with tag('td', klass='value'):
+											text(f'{section["y_values"][key]}{unit}')
+										with tag('td', klass='value'):
+											text(f'{section["y_avg_values"][key]}{unit}' if section['y_avg_values'] is not None else '-')
+
+				# runs, best and average of the last weeks
+				if section['weekly'] is not None:
+					with tag('div', klass='content'):
+						with tag('div', klass='data'):
+							with tag('h4', klass='title'):
+								text('Weekly Stats')
+
+							doc.stag('hr', klass='data-sep')
+
+							with tag('table', klass='datatable'):
+								with tag('tbody'):
+									with tag('tr'):
+										for header in ['Week', 'Runs', 'Best', 'Avg']:
+											with tag('td', klass='bottomborder'):
+												text(header)
+
+									for week, *values in section['weekly']:
+										with tag('tr'):
+											with tag('td', klass='category rightborder'):
+												text(week)
+											for value in values:
+												with tag('td', klass='value'):
+													text(value)
+
+				# kill stats, from the deep parse of the kill events
+				if section['events'] is not None:
+					events = section['events']
+					with tag('div', klass='content'):
+						img_path = events['chart_job']['fpath']
+						img_path_href = os.path.join('.', os.path.relpath(img_path, self.report_folder_path))
+						doc.stag('img', src=img_path_href, klass='graph')
+
+						with tag('div', klass='data'):
+							with tag('h4', klass='title'):
+								text('Kill Stats')
+
+							doc.stag('hr', klass='data-sep')
+
+							rows = [
+								('TTK Median', f'{events["y_values"]["median"]}s'),
+								('TTK P10', f'{events["y_values"]["p10"]}s'),
+								('TTK P90', f'{events["y_values"]["p90"]}s'),
+								('TTK CV', events['y_values']['cv']),
+								('Kills', events['y_values']['kills']),
+							]
+							rows += [(f'Acc. {name}', f'{accuracy}%') for name, accuracy in events['weapons'].items()]
+
+							with tag('table', klass='datatable'):
+								with tag('tbody'):
+									for category, value in rows:
+										with tag('tr'):
+											with tag('td', klass='category rightborder'):
+												text(category)
+											with tag('td', klass='value'):
+												text(value)
+
+				# scores per sens bucket, in cm/360
+				if section['sens'] is not None:
+					with tag('div', klass='content'):
+						with tag('div', klass='data'):
+							with tag('h4', klass='title'):
+								text('Scores by Sensitivity')
+
+							doc.stag('hr', klass='data-sep')
+
+							with tag('table', klass='datatable'):
+								with tag('tbody'):
+									with tag('tr'):
+										for header in ['cm/360', 'Runs', 'Best', 'Avg', 'P50', 'P90']:
+											with tag('td', klass='bottomborder'):
+												text(header)
+
+									for sens_range, *values in section['sens']['rows']:
+										with tag('tr'):
+											with tag('td', klass='category rightborder'):
+												text(sens_range)
+											for value in values:
+												with tag('td', klass='value'):
+													text(value)
+
+			# otherwise, display an alert in the report
+			else:
+				with tag('div', klass='no-scenarios'):
+					with tag('p'):
+						text('No stat files found!')
 
-		if round(max_y) not in yticks:
-			yticks.append(max_y)
+		return doc.getvalue()
 
-		yticks.sort()
-		yticks_str = [round(y) for y in yticks]
+	# returns the body of the report html file
+	# f_progress is called as f_progress(done, total, stage_text) along the generation
+	# when cancel_event (threading.Event) is set, the generation stops, the report folder is removed
+	# and ReportCancelledException is raised
+	# update_in_place: if True, the stable report folder of the playlist is updated and only the changed
+	#                  sections are generated again, if None the configured option is used
+	def generate_report(self, f_progress = None, cancel_event = None, update_in_place = None):
+		if update_in_place is None:
+			update_in_place = self.cfg.get_option(ckeys.OPTIONKEY_UPDATE_IN_PLACE_CHECK)
+
+		folders = self.create_folders(update_in_place)
+		profile_enabled = self.cfg.get_option(ckeys.OPTIONKEY_PROFILE_CHECK)
+
+		if not update_in_place:
+			try:
+				with timing.profile(profile_enabled, self.report_folder_path):
+					return self.generate_report_content(f_progress, cancel_event)
+			except ReportCancelledException:
+				shutil.rmtree(self.report_folder_path, ignore_errors=True)
+				raise
+
+		# a cancelled update keeps the previous report and manifest
+		with timing.profile(profile_enabled, self.report_folder_path):
+			self.manifest = self.load_manifest()
+			report_content = self.generate_report_content(f_progress, cancel_event)
+			self.write_manifest()
+
+		return report_content
+
+	def generate_report_content(self, f_progress = None, cancel_event = None):
+		if f_progress is None:
+			f_progress = lambda done, total, stage_text: None
+
+		scenarios_names = self.playlist.scenarios_names
+		days = self.cfg.get_option(ckeys.OPTIONKEY_DAYS_NUMBER) if self.cfg.get_option(ckeys.OPTIONKEY_DAYS_CHECK) else None
+
+		# in update in place mode, sections whose fingerprint did not change are reused from the manifest
+		fingerprints = [self.get_section_fingerprint(i, scenario_name, days) for i, scenario_name in enumerate(scenarios_names)]
+		fragments = [self.get_manifest_fragment(scenario_name, fingerprint) for scenario_name, fingerprint in zip(scenarios_names, fingerprints)]
+		stale = [i for i, fragment in enumerate(fragments) if fragment is None]
+		images = [self.manifest['sections'][scenario_name]['images'] if fragment is not None else [] for scenario_name, fragment in zip(scenarios_names, fragments)]
+
+		# all changed sections are fed from a single stats load
+		with self.timer.stage('load stats'):
+			playlist_stats = self.load_playlist_stats([scenarios_names[i] for i in stale], days_n=days, 
+													f_progress=lambda done, total: f_progress(done, total, 'Parsing stat files'), cancel_event=cancel_event)
+
+		# kill events, only with the deep parse mode
+		playlist_events = dict()
+		if self.cfg.get_option(ckeys.OPTIONKEY_DEEP_PARSE_CHECK):
+			with self.timer.stage('load events'):
+				playlist_events = self.load_playlist_events([scenarios_names[i] for i in stale], days_n=days,
+															f_progress=lambda done, total: f_progress(done, total, 'Parsing kill events'), cancel_event=cancel_event)
+
+		sections = []
+		for i in stale:
+			utilities.check_cancelled(cancel_event)
+			scenario_name = scenarios_names[i]
+			section = self.make_section_data(scenario_name, playlist_stats[scenario_name], playlist_events.get(scenario_name))
+			with self.timer.stage('html sections'):
+				fragments[i] = self.generate_section(i, scenario_name, section)
+			images[i] = self.get_section_images(section)
+			sections.append(section)
+			f_progress(len(sections), len(stale), scenario_name)
+
+		# charts missing from the chart cache are rendered in parallel while the html is built
+		with self.timer.stage('start rendering'):
+			chart_jobs = [section['chart_job'] for section in sections if section is not None]
+			chart_jobs += [section['events']['chart_job'] for section in sections if section is not None and section['events'] is not None]
+			chart_cache = ChartCache.from_config(self.cfg)
+			render_jobs = chart_cache.get_missing_jobs(chart_jobs)
+			wait_charts = charts.render_charts_async(render_jobs)
 
-		ax.set_xticks(xticks)
-		ax.set_xticklabels(xticks_str)
-		ax.tick_params(axis='x', labelsize=7, color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_XTICKS), labelcolor=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_XTICKSLABELS))
+		# document creation
+		with self.timer.stage('html assembly'):
+			doc, tag, text = yattag.Doc().tagtext()
 
-		ax.set_yticks(yticks)
-		ax.set_yticklabels(yticks_str)
-		ax.tick_params(axis='y', labelsize=7, color=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_YTICKS), labelcolor=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_YTICKSLABELS))
+			with tag('h2', klass='playlist-name'):
+				text(f'Playlist: {self.playlist.name}')
 
-		# borders
-		ax.spines['top'].set_visible(False)
-		ax.spines['right'].set_visible(False)
+			i = 0
+			for fragment in fragments:
+				doc.asis(fragment)
 
-		ax.spines['left'].set_color(self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_BORDERLEFT))
-		ax.spines['bottom'].set_color(self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_BORDERBOTTOM))
+				if i != len(fragments) - 1:
+					doc.stag('hr', klass='scenario-sep')
 
-		# annotations
-		if self.cfg.get_option(ckeys.OPTIONKEY_PERCENTAGES_CHECK) and self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK):
-			for i in range(len(data_y)):
-				percentage = data_y[i]/data_y_avg[i]*100
+				i += 1
 
-				if percentage != 100:
-					percentage_txt = round(percentage - 100 if percentage > 100 else 100 - percentage, 1)
-					color = self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_PERCENTAGE_POSITIVE) if percentage > 100 else self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_PERCENTAGE_NEGATIVE)
-					symbol = CHAR_TRIANGLE_SMALL_UP if percentage > 100 else CHAR_TRIANGLE_SMALL_DOWN
-					text = f'{symbol} {percentage_txt}%'
-					y_offset = 50 if percentage > 100 else -50
+			report_content = self.generate_document('KovaaK\'s Stat Report', doc.getvalue())
 
-					ax.annotate(text, (data_x[i], data_y[i]), ha='center', textcoords='offset pixels', xytext=(0, y_offset), 
-                                            color=color, fontsize=9, path_effects=[pe.withStroke(linewidth=1.5, foreground=self.cfg.get_graph(ckeys.GRAPHKEY_COLOR_PERCENTAGE_OUTLINE))])
+		with self.timer.stage('render charts'):
+			wait_charts(lambda done, total: f_progress(done, total, 'Rendering charts'), cancel_event)
+			chart_cache.export(chart_jobs)
+			chart_cache.prune()
 
-		# layout
-		fig.tight_layout()
+		if self.manifest is not None:
+			self.manifest['sections'] = {scenario_name: {'fingerprint': fingerprint, 'html': fragment, 'images': section_images}
+										for scenario_name, fingerprint, fragment, section_images in zip(scenarios_names, fingerprints, fragments, images)}
 
-		fname = f'{scenario_name}.png'
-		fpath = os.path.join(folder_path, fname)
-		fig.savefig(fpath, dpi=300, transparent=True)
+		# the timing section is added last, so it covers the whole generation
+		if TIMING_SECTION_MARK in report_content:
+			report_content = report_content.replace(TIMING_SECTION_MARK, self.generate_timing_section())
 
-		return fpath
+		return report_content
 
-	# returns the body of the report html file
-	def generate_report(self):
-		folders = self.create_folders()
-		
-		# document creation
+	# returns the whole html file: head, header and the given content html
+	def generate_document(self, title, content):
 		doc, tag, text = yattag.Doc().tagtext()
 
 		doc.asis('<!DOCTYPE html>')
 		with tag('html'):
 			with tag('head'):
 				with tag('title'):
-					text('KovaaK\'s Stat Report')
+					text(title)
 
 				css_path = os.path.join(self.resources_folder_path, CSS_FILENAME)
 				css_path_href = os.path.join('.', os.path.relpath(css_path, self.report_folder_path))
@@ -253,7 +662,7 @@ class Report:
 				with tag('div', klass='header'):
 					with tag('div', klass='top'):
 						with tag('h1', klass='title'):
-							text('KOVAAK\'S STAT REPORT')
+							text(title.upper())
 
 						with tag('p', klass='author'):
 							text(f'Made by st{CHAR_DELTA}r')
@@ -266,123 +675,147 @@ class Report:
 							text(f'Generated at {datetime.now().strftime("%d-%m-%y @ %H:%M:%S")}')
 
 				doc.stag('hr', klass='main-sep')
-				
+			
 				with tag('div', klass='content'):
-					with tag('h2', klass='playlist-name'):
-						text(f'Playlist: {self.playlist.name}')
-
-					i = 0
-					for scenario_name in self.playlist.scenarios_names:
-						with tag('div', klass='scenario'):
-							with tag('div', klass='title'):
-								with tag('p', klass='icon'):
-									text(f'{str(i+1).zfill(2)} {CHAR_TRIANGLE}')
-								with tag('h3', klass='name'):
-									text(scenario_name)
-							
-							days = self.cfg.get_option(ckeys.OPTIONKEY_DAYS_NUMBER) if self.cfg.get_option(ckeys.OPTIONKEY_DAYS_CHECK) else None
-							scenarios = self.load_scenario_stats(scenario_name, days_n=days)
-
-							# if there are played scenarios, plot graph
-							if len(scenarios) > 0:
-								if self.cfg.get_option(ckeys.OPTIONKEY_GROUP_SESSIONS_CHECK):
-									hours_threshold = self.cfg.get_option(ckeys.OPTIONKEY_GROUP_SESSIONS_NUMBER)
-									scenarios_grouped = self.group_sessions(scenarios, hours_n=hours_threshold)
-									data = self.make_plottable_data(scenarios_grouped, target=TARGET_SCORE)
-								else:
-									data = self.make_plottable_data(scenarios, target=TARGET_SCORE)
-
-								x_ungrouped, y_ungrouped = self.make_plottable_data(scenarios, target=TARGET_SCORE)
-								y_values = self.get_data_values(y_ungrouped)
-
-								# plot averages
-								if self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK):
-									y_avg = self.make_averaged_data(data[1], average_sessions=5)
-									y_avg_ungrouped = self.make_averaged_data(y_avg, average_sessions=5)
-									y_avg_values = self.get_data_values(y_avg_ungrouped)
-								else:
-									y_avg = None
-
-								with tag('div', klass='content'):
-									img_path = self.plot(data[0], data[1], y_avg, y_values, scenario_name, self.resources_folder_path)
-									img_path_href = os.path.join('.', os.path.relpath(img_path, self.report_folder_path))
-									doc.stag('img', src=img_path_href, klass='graph')
-
-									with tag('div', klass='data'):
-										with tag('h4', klass='title'):
-											text('Ungrouped Stats')
-
-										doc.stag('hr', klass='data-sep')
-
-										with tag('table', klass='datatable'):
-											with tag('tbody'):
-												with tag('tr', klass='row1'):
-													with tag('td'):
-														text('')
-													with tag('td', klass='bottomborder'):
-														text('Original')
-													with tag('td', klass='bottomborder'):
-														text('Average')
-
-												with tag('tr', klass='row2'):
-													with tag('td', klass='category rightborder'):
-														text('Max')
-													with tag('td', klass='value'):
-														text(y_values['max'])
-													with tag('td', klass='value'):
-														text(y_avg_values['max'] if self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK) else '-')
-
-												with tag('tr', klass='row3'):
-													with tag('td', klass='category rightborder'):
-														text('Min')
-													with tag('td', klass='value'):
-														text(y_values['min'])
-													with tag('td', klass='value'):
-														text(y_avg_values['min'] if self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK) else '-')
-
-												with tag('tr', klass='row4'):
-													with tag('td', klass='category rightborder'):
-														text('Avg')
-													with tag('td', klass='value'):
-														text(y_values['avg'])
-													with tag('td', klass='value'):
-														text(y_avg_values['avg'] if self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK) else '-')
-
-												with tag('tr', klass='row5'):
-													with tag('td', klass='category rightborder'):
-														text('StDev')
-													with tag('td', klass='value'):
-														text(y_values['std'])
-													with tag('td', klass='value'):
-														text(y_avg_values['std'] if self.cfg.get_option(ckeys.OPTIONKEY_AVERAGE_CHECK) else '-')
-
-							# otherwise, display an alert in the report
-							else:
-								with tag('div', klass='no-scenarios'):
-									with tag('p'):
-										text('No stat files found!')
-
-
-
-						if i != len(self.playlist.scenarios_names) - 1:
-							doc.stag('hr', klass='scenario-sep')
-
-						i += 1
+					doc.asis(content)
+
+				if self.timer.enabled and self.cfg.get_option(ckeys.OPTIONKEY_TIMING_IN_REPORT_CHECK):
+					doc.asis(TIMING_SECTION_MARK)
+
+		return doc.getvalue()
+
+	# returns the html of the collapsible timing section
+	def generate_timing_section(self):
+		doc, tag, text = yattag.Doc().tagtext()
+
+		elapsed = self.timer.get_elapsed()
+		with tag('details', klass='timing'):
+			with tag('summary'):
+				text(f'Generation timing ({elapsed:.2f} s)')
+
+			with tag('table', klass='datatable'):
+				with tag('tbody'):
+					with tag('tr'):
+						for header in ['Stage', 'Total (ms)', 'Calls']:
+							with tag('td', klass='bottomborder'):
+								text(header)
+
+					for name, (seconds, calls) in self.timer.get_totals().items():
+						with tag('tr'):
+							with tag('td', klass='category rightborder'):
+								text(name)
+							with tag('td', klass='value'):
+								text(f'{seconds*1000:.1f}')
+							with tag('td', klass='value'):
+								text(calls)
 
 		return doc.getvalue()
 
-	def create_folders(self):
-		report_folder_name = f'KSV_report_{datetime.now().isoformat().replace(":","_").replace("T","_")}'
+	# writes the timing summary next to the report, if timing is enabled
+	# returns the log path, or None
+	def write_timing_log(self):
+		if not self.timer.enabled:
+			return None
+
+		fpath = os.path.join(self.report_folder_path, timing.TIMING_LOG_FILENAME)
+		name = self.playlist.name if self.playlist is not None else 'dashboard'
+		self.timer.write_log(fpath, title=f'{name} @ {datetime.now().isoformat()}')
+		return fpath
+
+	# returns what a section is generated from: its position, its stat files and the report options
+	# the stat files are identified by their count and the first and last timestamps, without opening them
+	def get_section_fingerprint(self, i, scenario_name, days_n = None):
+		entries = self.get_stats_index().get_entries(scenario_name, days_n)
+		first_timestamp = entries[0][0].isoformat() if len(entries) > 0 else None
+		last_timestamp = entries[-1][0].isoformat() if len(entries) > 0 else None
+
+		options = {key: self.cfg.get_option(key) for key in [
+			ckeys.OPTIONKEY_GROUP_SESSIONS_CHECK,
+			ckeys.OPTIONKEY_GROUP_SESSIONS_NUMBER,
+			ckeys.OPTIONKEY_DAYS_CHECK,
+			ckeys.OPTIONKEY_DAYS_NUMBER,
+			ckeys.OPTIONKEY_AVERAGE_CHECK,
+			ckeys.OPTIONKEY_PERCENTAGES_CHECK,
+			ckeys.OPTIONKEY_SMOOTHING_MODE,
+			ckeys.OPTIONKEY_DEEP_PARSE_CHECK,
+			ckeys.OPTIONKEY_SENS_CHECK,
+			ckeys.OPTIONKEY_SENS_BUCKET_NUMBER,
+			ckeys.OPTIONKEY_MOUSE_DPI_NUMBER,
+			ckeys.OPTIONKEY_DOWNSAMPLE_MODE,
+			ckeys.OPTIONKEY_DOWNSAMPLE_NUMBER,
+		]}
+		options['graphs'] = self.cfg.get_data()[ckeys.SECTION_GRAPHS]
+
+		return [i, len(entries), first_timestamp, last_timestamp, options]
+
+	# returns the html of a section from the manifest, or None if it has to be generated again
+	def get_manifest_fragment(self, scenario_name, fingerprint):
+		if self.manifest is None:
+			return None
+
+		section = self.manifest['sections'].get(scenario_name)
+		if section is None or section['fingerprint'] != fingerprint:
+			return None
+
+		# the charts may have been removed from the report folder
+		for image in section['images']:
+			if not os.path.isfile(os.path.join(self.report_folder_path, image)):
+				return None
+
+		return section['html']
+
+	# returns the paths of the charts linked by a section, relative to the report folder
+	def get_section_images(self, section):
+		if section is None:
+			return []
+
+		chart_jobs = [section['chart_job']]
+		if section['events'] is not None:
+			chart_jobs.append(section['events']['chart_job'])
+
+		return [os.path.relpath(chart_job['fpath'], self.report_folder_path) for chart_job in chart_jobs]
+
+	# returns the manifest of the report folder, or an empty one if missing or outdated
+	def load_manifest(self):
+		fpath = os.path.join(self.report_folder_path, REPORT_MANIFEST_FILENAME)
+		try:
+			with io.open(fpath, 'r', encoding='utf-8') as fp:
+				manifest = json.load(fp)
+		except (OSError, ValueError):
+			manifest = None
+
+		if manifest is None or manifest.get('version') != REPORT_MANIFEST_VERSION:
+			manifest = {'version': REPORT_MANIFEST_VERSION, 'sections': dict()}
+
+		return manifest
+
+	def write_manifest(self):
+		fpath = os.path.join(self.report_folder_path, REPORT_MANIFEST_FILENAME)
+		with io.open(fpath + '.tmp', 'w', encoding='utf-8') as fp:
+			json.dump(self.manifest, fp)
+
+		os.replace(fpath + '.tmp', fpath)
+
+	# update_in_place: if True, uses the stable folder of the playlist instead of a new timestamped one
+	def create_folders(self, update_in_place = False):
+		if update_in_place:
+			report_folder_name = f'{REPORT_FOLDERNAME_PREFIX}{Report.get_safe_filename(self.playlist.name)}'
+		else:
+			report_folder_name = f'{REPORT_FOLDERNAME_PREFIX}{datetime.now().isoformat().replace(":","_").replace("T","_")}'
+
 		self.report_folder_path = os.path.join(self.cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS), report_folder_name)
 		self.resources_folder_path = os.path.join(self.cfg.get_path(ckeys.PATHKEY_LOCAL_REPORTS), report_folder_name, REPORT_RESOURCES_FOLDERNAME)
 
-		os.mkdir(self.report_folder_path)
-		os.mkdir(self.resources_folder_path)
+		os.makedirs(self.resources_folder_path, exist_ok=update_in_place)
 
+	# the report is replaced atomically, a browser reloading an updated report never sees a partial file
 	def write_report(self, report_content):
 		fpath = os.path.join(self.report_folder_path, REPORT_FILENAME)
-		with io.open(fpath, 'w', encoding='utf-8') as fp:
-			fp.write(report_content)
+		with self.timer.stage('write report'):
+			with io.open(fpath + '.tmp', 'w', encoding='utf-8') as fp:
+				fp.write(report_content)
+
+			os.replace(fpath + '.tmp', fpath)
 
 		return fpath
 
@@ -408,5 +841,11 @@ class Report:
 
 	def write_css(self, css_content):
 		fpath = os.path.join(self.resources_folder_path, CSS_FILENAME)
-		with io.open(fpath, 'w', encoding='utf-8') as fp:
-			fp.write(css_content)
+		with self.timer.stage('write report'):
+			with io.open(fpath, 'w', encoding='utf-8') as fp:
+				fp.write(css_content)
+
+	# replaces the characters that are not allowed in windows filenames
+	@staticmethod
+	def get_safe_filename(name):
+		return ''.join('_' if c in '<>:"/\\|?*' else c for c in name).strip(' .')
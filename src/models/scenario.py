@@ -1,9 +1,8 @@
 import os
-import statistics
 from datetime import datetime
 
-from util.exceptions import DifferentScenariosException, ModeSelectionException
-import util.utilities
+from models.statsindex import StatsIndex, STAT_FILENAME_SEPARATOR, STAT_FILENAME_TIMESTAMP_FORMAT
+from models.statsindex import parse_stat_filename
 
 TARGET_KILLS = 'target_kills'
 TARGET_DEATHS = 'target_deaths'
@@ -26,6 +25,18 @@ TARGET_PAUSEDURATION = 'target_pause_duration'
 TARGET_SHOTS = 'target_shots'
 TARGET_ACCURACY = 'target_accuracy'
 
+# summary fields found in block 2 of a stat file
+SUMMARY_KEYS = [
+					'kills', 'deaths', 'fight_time', 'time_remaining', 'avg_ttk', 
+					'damage_done', 'damage_taken', 'hit_count', 'miss_count', 'midairs', 
+					'midaired', 'directs', 'directed', 'reloads', 'distance_traveled', 
+					'mbs_points', 'score', 'pause_count', 'pause_duration'
+				]
+
+# settings fields found in block 3 of a stat file, sens_scale is the only text value
+SETTINGS_KEYS = ['sens_scale', 'horiz_sens', 'vert_sens', 'fov', 'avg_fps']
+SETTINGS_TEXT_KEYS = ['sens_scale']
+
 TARGETS_AVALIABLE = [
 						TARGET_KILLS, TARGET_DEATHS, TARGET_TIMEPLAYED, TARGET_TIMELEFT, TARGET_TTK, 
 						TARGET_DMGDONE, TARGET_DMGTAKEN, TARGET_HITS, TARGET_MISSES, TARGET_MIDAIRS, 
@@ -34,17 +45,112 @@ TARGETS_AVALIABLE = [
 						TARGET_SHOTS, TARGET_ACCURACY
 					]
 
+# summary key read for each target, shots and accuracy are derived from hits and misses
+TARGET_KEYS = {
+					TARGET_KILLS: 'kills', TARGET_DEATHS: 'deaths', TARGET_TIMEPLAYED: 'fight_time', 
+					TARGET_TIMELEFT: 'time_remaining', TARGET_TTK: 'avg_ttk', TARGET_DMGDONE: 'damage_done', 
+					TARGET_DMGTAKEN: 'damage_taken', TARGET_HITS: 'hit_count', TARGET_MISSES: 'miss_count', 
+					TARGET_MIDAIRS: 'midairs', TARGET_DIRECTS: 'directs', TARGET_DIRECTED: 'directed', 
+					TARGET_RELOADS: 'reloads', TARGET_DISTANCETRAVELED: 'distance_traveled', 
+					TARGET_MBS_POINTS: 'mbs_points', TARGET_SCORE: 'score', TARGET_PAUSES: 'pause_count', 
+					TARGET_PAUSEDURATION: 'pause_duration'
+				}
+
+# the summary block (block 2) always starts with the kills line
+SUMMARY_MARKER = b'\nKills:,'
+SUMMARY_KEYS_SKIPPED = ['hash', 'game_version', 'challenge_start']
+
+# returns the settings key and value of a block 3 line, or None if the setting is not kept
+def parse_settings_line(line):
+	key, sep, value = line.partition(':,')
+	key = key.lower().replace(' ', '_')
+	if len(sep) == 0 or key not in SETTINGS_KEYS:
+		return None
+
+	if key in SETTINGS_TEXT_KEYS:
+		return key, value
+
+	try:
+		return key, float(value)
+	except ValueError:
+		return None
+
+# fast path of the stat file parser: reads the file in one go, seeks straight to the summary block
+# and parses only its lines and the settings block after it, the kill events and weapons blocks are never split into lines
+# returns (scenario name, data), or None if the summary block cannot be found or parsed,
+# in which case the line by line parser of Scenario.__init__ should be used
+def read_summary(scenario_path):
+	with open(scenario_path, 'rb') as fp:
+		content = fp.read()
+
+	start = content.find(SUMMARY_MARKER)
+	if start < 0:
+		return None
+
+	name = ''
+	data = dict()
+	pos = start + 1
+	while pos < len(content):
+		end = content.find(b'\n', pos)
+		if end < 0:
+			end = len(content)
+
+		line = content[pos:end].rstrip(b'\r')
+		pos = end + 1
+		if len(line) == 0:
+			break
+
+		key, sep, value = line.partition(b':,')
+		if len(sep) == 0:
+			return None
+
+		try:
+			key = key.decode('utf-8').lower().replace(' ', '_')
+			value = value.decode('utf-8')
+		except UnicodeDecodeError:
+			return None
+
+		if key == 'scenario':
+			name = value
+			continue
+
+		if key in SUMMARY_KEYS_SKIPPED:
+			continue
+
+		try:
+			data[key] = float(value) if '.' in value else int(value)
+		except ValueError:
+			return None
+
+	# settings block, older files do not have it
+	for line in content[pos:].split(b'\n'):
+		line = line.rstrip(b'\r')
+		if len(line) == 0:
+			break
+
+		try:
+			setting = parse_settings_line(line.decode('utf-8'))
+		except UnicodeDecodeError:
+			continue
+
+		if setting is not None:
+			data[setting[0]] = setting[1]
+
+	return name, data
+
 # holds the data for a single kovaaks stat file
 class Scenario:
 	def __init__(self, scenario_path = None):
+		self._scenario_path = scenario_path
+		self._name = ''
+		self._timestamp = None
+		self._data = dict()
+
 		if scenario_path is None:
 			return None
 
-		self._scenario_path = scenario_path
-		self._name = ''
 		# self._timestamp = datetime.fromtimestamp(os.path.getctime(self._scenario_path))
-		self._timestamp = datetime.strptime(os.path.basename(scenario_path).split(' - Challenge - ')[1], '%Y.%m.%d-%H.%M.%S Stats.csv')
-		self._data = dict()
+		self._timestamp = datetime.strptime(os.path.basename(scenario_path).split(STAT_FILENAME_SEPARATOR)[1], STAT_FILENAME_TIMESTAMP_FORMAT)
 
 		block = 0
 		with open(self._scenario_path, 'r') as fp:
@@ -67,6 +173,17 @@ class Scenario:
 					value = float(value) if '.' in value else int(value)
 					self._data[key] = value
 
+				elif block == 3:
+					setting = parse_settings_line(line.strip('\n'))
+					if setting is not None:
+						self._data[setting[0]] = setting[1]
+
+	def get_path(self):
+		return self._scenario_path
+
+	def set_path(self, new_path):
+		self._scenario_path = new_path
+
 	def get_name(self):
 		return self._name
 
@@ -200,82 +317,29 @@ class Scenario:
 		return f'Scenario:{self.get_name()}'
 
 
+	# builds a scenario from already parsed data (ex: from the stats cache)
+	@staticmethod
+	def from_data(scenario_path, name, timestamp, data):
+		scen = Scenario()
+		scen.set_path(scenario_path)
+		scen.set_name(name)
+		scen.set_timestamp(timestamp)
+		scen.set_data(data)
+		return scen
+
+	# parses a stat file, with the summary fast path when possible
+	@staticmethod
+	def from_file(scenario_path):
+		summary = read_summary(scenario_path)
+		parsed = parse_stat_filename(os.path.basename(scenario_path))
+		if summary is None or parsed is None:
+			return Scenario(scenario_path)
+
+		name, data = summary
+		return Scenario.from_data(scenario_path, name, parsed[1], data)
+
 	# lists all scenario names in the stat folder
+	# names are taken from the filenames, the same names reports look scenarios up by
 	@staticmethod
 	def list_scenarios(stats_folder):
-		fnames = os.listdir(stats_folder)
-		scenarios = [fname.split(' - Challenge - ')[0] for fname in fnames]
-		scenarios = list(set(scenarios))
-		scenarios.sort()
-		return scenarios
-
-	# returns a single scenario object from a list of scenarios
-	# various options for date/time and data are avaliable (min, max, average)
-	@staticmethod
-	def merge_scenarios(scenarios, date_mode = None, time_mode = None, data_mode = None):
-		# name
-		names = set([sce.get_name() for sce in scenarios])
-		if len(names) != 1:
-			raise DifferentScenariosException(f'Different scenario names ({len(names)}).')
-
-		sce_name = names.pop()
-
-		# timestamp
-		timestamps = [sce.get_timestamp() for sce in scenarios]
-		
-		# for both date and time modes:
-		# 0: min timestamp
-		# 1: max timestamp
-		# 2: average timestamps
-		if date_mode is None:
-			raise ModeSelectionException('No date_mode selected')
-		elif date_mode == 0:
-			f_date = min
-		elif date_mode == 1:
-			f_date = max
-		elif date_mode == 2:
-			f_date = ksv_utilities.avg_datetime
-		else:
-			raise ModeSelectionException(f'Invalid date_mode: {date_mode}')
-
-		if time_mode is None:
-			raise ModeSelectionException('No time_mode selected')
-		elif time_mode == 0:
-			f_time = min		
-		elif time_mode == 1:
-			f_time = max
-		elif time_mode == 2:
-			f_time = ksv_utilities.avg_datetime
-		else:
-			raise ModeSelectionException(f'Invalid time_mode: {time_mode}')
-
-		date = f_date(timestamps).date()
-		time = f_time(timestamps).time()
-		sce_timestamp = datetime.combine(date, time)
-
-		# data
-		# data modes:
-		# 0: min
-		# 1: max
-		# 2: average (returns float)
-		if data_mode is None:
-			raise ModeSelectionException('No data_mode selected')
-		if data_mode == 0:
-			f_data = min
-		elif data_mode == 1:
-			f_data = max
-		elif data_mode == 2:
-			f_data = statistics.fmean
-
-		sce_data = dict()
-		for key in scenarios[0].get_data():
-			values = [sce.get_data()[key] for sce in scenarios]
-			sce_data[key] = f_data(values)
-
-		# assemble scenario
-		merged_scenario = Scenario()
-		merged_scenario.set_name(sce_name)
-		merged_scenario.set_timestamp(sce_timestamp)
-		merged_scenario.set_data(sce_data)
-
-		return merged_scenario
+		return StatsIndex(stats_folder).get_names()
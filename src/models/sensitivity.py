@@ -0,0 +1,88 @@
+import numpy as np
+
+# sens scales measured in distance, the sensitivity is the mouse distance of a 360 turn
+SENS_SCALE_CM = 'cm/360'
+SENS_SCALE_INCHES = 'inches/360'
+
+# degrees turned per mouse count at a sensitivity of 1, for the game sens scales
+SENS_SCALE_YAWS = {
+	'Quake/Source': 0.022,
+	'CSGO': 0.022,
+	'Apex': 0.022,
+	'Overwatch': 0.0066,
+	'Valorant': 0.07,
+}
+
+CM_PER_INCH = 2.54
+
+DEFAULT_MOUSE_DPI = 800
+DEFAULT_BUCKET_WIDTH = 2
+
+# score percentiles of every sens bucket
+BUCKET_PERCENTILES = [50, 90]
+
+# returns the cm/360 of every run, nan for unknown sens scales or missing settings
+# scales: sens scale of every run (str or None), sens: horizontal sensitivity of every run
+# game scales are converted with the mouse dpi, each distinct scale is looked up once
+def get_cm360(scales, sens, mouse_dpi = DEFAULT_MOUSE_DPI):
+	sens = np.asarray(sens, dtype=np.float64)
+	if len(sens) == 0:
+		return np.empty(0)
+
+	unique_scales, inverse = np.unique(np.array([scale if scale is not None else '' for scale in scales], dtype=object), return_inverse=True)
+
+	# cm/360 = factor * sens if direct, factor / sens otherwise
+	factors = np.full(len(unique_scales), np.nan)
+	direct = np.zeros(len(unique_scales), dtype=bool)
+	for i, scale in enumerate(unique_scales.tolist()):
+		if scale == SENS_SCALE_CM:
+			factors[i], direct[i] = 1.0, True
+		elif scale == SENS_SCALE_INCHES:
+			factors[i], direct[i] = CM_PER_INCH, True
+		elif scale in SENS_SCALE_YAWS:
+			factors[i] = 360 / SENS_SCALE_YAWS[scale] / mouse_dpi * CM_PER_INCH
+
+	factors = factors[inverse]
+	direct = direct[inverse]
+	with np.errstate(divide='ignore', invalid='ignore'):
+		cm360 = np.where(direct, factors * sens, factors / sens)
+
+	cm360[~np.isfinite(cm360) | (cm360 <= 0)] = np.nan
+	return cm360
+
+# returns the score stats of every sens bucket, buckets are bucket_width cm/360 wide
+# runs without a known sens are left out
+# returns a dict of arrays, one value per played bucket, sorted by sens:
+#	low, high: cm/360 bounds, runs, best, avg, p50, p90 (BUCKET_PERCENTILES)
+def get_bucket_stats(cm360, scores, bucket_width = DEFAULT_BUCKET_WIDTH):
+	mask = np.isfinite(cm360) & np.isfinite(scores)
+	cm360 = cm360[mask]
+	scores = scores[mask]
+	if len(scores) == 0:
+		return None
+
+	# runs sorted by bucket, then by score, so every bucket is a contiguous sorted slice
+	buckets = np.floor(cm360 / bucket_width).astype(np.int64)
+	order = np.lexsort((scores, buckets))
+	buckets = buckets[order]
+	scores = scores[order]
+
+	starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+	counts = np.diff(np.append(starts, len(scores)))
+
+	stats = dict()
+	stats['low'] = buckets[starts] * bucket_width
+	stats['high'] = stats['low'] + bucket_width
+	stats['runs'] = counts
+	stats['best'] = scores[starts + counts - 1]
+	stats['avg'] = np.add.reduceat(scores, starts) / counts
+
+	# linear interpolation between the two closest ranks, as np.percentile
+	for q in BUCKET_PERCENTILES:
+		rank = (counts - 1) * q / 100
+		below = np.floor(rank).astype(np.int64)
+		above = np.minimum(below + 1, counts - 1)
+		weight = rank - below
+		stats[f'p{q}'] = scores[starts + below] * (1 - weight) + scores[starts + above] * weight
+
+	return stats
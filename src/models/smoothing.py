@@ -0,0 +1,37 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# trailing window smoothers, the first values use the shorter windows avaliable
+# (the window of index i is data_y[max(i - (window - 1), 0): i+1])
+
+# trailing window mean, computed from a cumulative sum
+def rolling_mean(data_y, window):
+	data_y = np.asarray(data_y, dtype=np.float64)
+	n = len(data_y)
+	if n == 0:
+		return data_y
+
+	cumsum = np.concatenate(([0.0], np.cumsum(data_y)))
+	ends = np.arange(1, n+1)
+	starts = np.maximum(ends - window, 0)
+	return (cumsum[ends] - cumsum[starts]) / (ends - starts)
+
+# trailing window median, the short windows at the start are padded with nan
+def rolling_median(data_y, window):
+	data_y = np.asarray(data_y, dtype=np.float64)
+	if len(data_y) == 0:
+		return data_y
+
+	padded = np.concatenate((np.full(window - 1, np.nan), data_y))
+	return np.nanmedian(sliding_window_view(padded, window), axis=1)
+
+# exponentially weighted mean with span = window, starting at the first value
+def exponential_mean(data_y, window):
+	data_y = np.asarray(data_y, dtype=np.float64)
+	if len(data_y) == 0:
+		return data_y
+
+	alpha = 2 / (window + 1)
+	smoothed, _ = lfilter([alpha], [1, alpha - 1], data_y, zi=[(1 - alpha) * data_y[0]])
+	return smoothed
@@ -0,0 +1,214 @@
+import os
+import sqlite3
+from datetime import datetime
+
+from models.scenario import Scenario
+from models.scenario import SUMMARY_KEYS, SETTINGS_KEYS
+from models.ingest import parse_stat_files, parse_event_files
+
+STATS_CACHE_FILENAME = 'stats_cache.db'
+STATS_CACHE_VERSION = 2
+
+# max number of sql variables per query, older sqlite builds are limited to 999
+SQL_CHUNK_SIZE = 500
+
+# persistent cache of parsed stat files, stored next to config.json
+# stat files are never modified once written by kovaaks, so each file is parsed only once
+# rows are keyed by path and validated with the file size and mtime
+class StatsCache:
+	def __init__(self, db_path):
+		self.db_path = db_path
+		self.create_tables()
+
+	# a connection is opened per operation, so the cache can be used from any thread
+	def connect(self):
+		return sqlite3.connect(self.db_path)
+
+	def create_tables(self):
+		columns = ', '.join(f'"{key}"' for key in SUMMARY_KEYS + SETTINGS_KEYS)
+
+		with self.connect() as conn:
+			version = conn.execute('PRAGMA user_version').fetchone()[0]
+			if version != STATS_CACHE_VERSION:
+				conn.execute('DROP TABLE IF EXISTS stats')
+				conn.execute('DROP TABLE IF EXISTS events')
+				conn.execute(f'PRAGMA user_version = {STATS_CACHE_VERSION}')
+
+			conn.execute(f'CREATE TABLE IF NOT EXISTS stats (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, name TEXT NOT NULL, timestamp INTEGER NOT NULL, {columns})')
+			conn.execute('CREATE INDEX IF NOT EXISTS stats_name_timestamp ON stats (name, timestamp)')
+			# the sens buckets are computed on every load (cm/360 depends on the mouse dpi), so runs are never queried by sens
+			conn.execute('DROP INDEX IF EXISTS stats_name_sens')
+
+			# kill events and weapons of the deep parse mode, one blob per column, see models.events
+			conn.execute('CREATE TABLE IF NOT EXISTS events (path TEXT PRIMARY KEY, kill_times BLOB, ttks BLOB, shots BLOB, hits BLOB, damage_done BLOB, weapon_shots BLOB, weapon_hits BLOB, weapon_damage BLOB, weapon_names TEXT)')
+
+		conn.close()
+
+	# validates the whole cache against a stats folder index
+	# new or modified files are parsed, rows of deleted files are removed
+	# f_progress is called as f_progress(files_done, files_total) while parsing
+	# when cancel_event is set, the parsing stops and ReportCancelledException is raised, see models.ingest
+	# returns the number of parsed files
+	def sync(self, index, f_progress = None, cancel_event = None):
+		with self.connect() as conn:
+			cached = {path: (size, mtime_ns) for path, size, mtime_ns in conn.execute('SELECT path, size, mtime_ns FROM stats')}
+		conn.close()
+
+		scen_paths = index.get_all_paths()
+		stale_paths = [path for path in scen_paths if cached.get(path) != index.get_signature(path)]
+
+		removed_paths = cached.keys() - set(scen_paths)
+		if len(removed_paths) > 0:
+			with self.connect() as conn:
+				conn.executemany('DELETE FROM stats WHERE path = ?', [(path,) for path in removed_paths])
+				conn.executemany('DELETE FROM events WHERE path = ?', [(path,) for path in removed_paths])
+			conn.close()
+
+		rows = self.ingest(index, stale_paths, f_progress, cancel_event)
+		return len(rows)
+
+	# parses the given stat files and stores them in the cache
+	# large batches (ex: first run, cache rebuild) are parsed in parallel
+	# files that cannot be parsed (ex: still being written) are skipped
+	# returns the stored rows as a dict path -> row
+	def ingest(self, index, scen_paths, f_progress = None, cancel_event = None):
+		# signatures are taken before parsing, a file modified meanwhile is parsed again on the next sync
+		signatures = dict()
+		for scen_path in scen_paths:
+			try:
+				signatures[scen_path] = index.get_signature(scen_path)
+			except OSError:
+				continue
+
+		rows = dict()
+		for record in parse_stat_files(list(signatures.keys()), f_progress=f_progress, cancel_event=cancel_event):
+			scen_path = record[0]
+			rows[scen_path] = (scen_path, *signatures[scen_path], *record[1:])
+
+		if len(rows) > 0:
+			placeholders = ', '.join(['?'] * (5 + len(SUMMARY_KEYS) + len(SETTINGS_KEYS)))
+			with self.connect() as conn:
+				conn.executemany(f'INSERT OR REPLACE INTO stats VALUES ({placeholders})', rows.values())
+				# the events of a modified file are parsed again when needed
+				conn.executemany('DELETE FROM events WHERE path = ?', [(path,) for path in rows])
+			conn.close()
+
+		return rows
+
+	# returns the cached rows of the given paths as a dict path -> row
+	def select_rows(self, scen_paths):
+		rows = dict()
+		with self.connect() as conn:
+			for i in range(0, len(scen_paths), SQL_CHUNK_SIZE):
+				chunk = scen_paths[i: i+SQL_CHUNK_SIZE]
+				placeholders = ', '.join(['?'] * len(chunk))
+				for row in conn.execute(f'SELECT * FROM stats WHERE path IN ({placeholders})', chunk):
+					rows[row[0]] = row
+		conn.close()
+
+		return rows
+
+	# returns the rows of the given paths as a dict path -> row
+	# only missing or outdated files are parsed
+	def get_rows(self, index, scen_paths, f_progress = None, cancel_event = None):
+		rows = self.select_rows(scen_paths)
+
+		stale_paths = [path for path in scen_paths if path not in rows or rows[path][1:3] != index.get_signature(path)]
+		rows.update(self.ingest(index, stale_paths, f_progress, cancel_event))
+
+		return rows
+
+	# returns the scenarios of the given paths, in the same order
+	def get_scenarios(self, index, scen_paths):
+		rows = self.get_rows(index, scen_paths)
+		return [StatsCache.row_to_scenario(rows[path]) for path in scen_paths if path in rows]
+
+	# returns a columnar history per scenario name, from a dict name -> paths
+	# all paths are answered by a single batch of queries
+	# mouse_dpi converts the game sens scales to cm/360
+	def get_histories(self, index, paths_by_name, f_progress = None, mouse_dpi = None, cancel_event = None):
+		# imported here, numpy is not needed to list names or sync the cache
+		from models.history import ScenarioHistory
+		from models.sensitivity import get_cm360, DEFAULT_MOUSE_DPI
+
+		all_paths = [scen_path for scen_paths in paths_by_name.values() for scen_path in scen_paths]
+		rows = self.get_rows(index, all_paths, f_progress, cancel_event)
+
+		# row: (path, size, mtime_ns, name, timestamp, *values, *settings)
+		# the sensitivity of every row is normalized in one pass
+		i_settings = 5 + len(SUMMARY_KEYS)
+		i_scale = i_settings + SETTINGS_KEYS.index('sens_scale')
+		i_sens = i_settings + SETTINGS_KEYS.index('horiz_sens')
+		paths = list(rows.keys())
+		cm360 = get_cm360([rows[path][i_scale] for path in paths], [rows[path][i_sens] if rows[path][i_sens] is not None else float('nan') for path in paths],
+							mouse_dpi if mouse_dpi is not None else DEFAULT_MOUSE_DPI)
+		sens_by_path = dict(zip(paths, cm360.tolist()))
+
+		histories = dict()
+		for name, scen_paths in paths_by_name.items():
+			histories[name] = ScenarioHistory.from_rows(name, [(*rows[path][4:i_settings], sens_by_path[path]) for path in scen_paths if path in rows])
+
+		return histories
+
+	# returns the given summary columns of every run of the stats folder, from a single query
+	# the cache is synced with the index first, so only new files are parsed
+	# returns (names, timestamps, columns): names as an object array, timestamps as int64 epoch seconds
+	# and one float64 array per key (missing values are nan), all in the same run order
+	def get_columns(self, index, keys, f_progress = None, cancel_event = None):
+		import numpy as np
+
+		self.sync(index, f_progress, cancel_event)
+
+		columns = ', '.join(f'"{key}"' for key in keys)
+		with self.connect() as conn:
+			rows = conn.execute(f'SELECT name, timestamp, {columns} FROM stats').fetchall()
+		conn.close()
+
+		if len(rows) == 0:
+			return np.empty(0, dtype=object), np.empty(0, dtype=np.int64), {key: np.empty(0) for key in keys}
+
+		table = list(zip(*rows))
+		names = np.array(table[0], dtype=object)
+		timestamps = np.array(table[1], dtype=np.int64)
+		return names, timestamps, {key: np.array(values, dtype=np.float64) for key, values in zip(keys, table[2:])}
+
+	# returns the kill events and weapons of the given paths as a dict path -> RunEvents
+	# files are only read the first time, their events are then stored in the cache
+	# the summaries of the paths must be up to date (ex: get_rows or get_histories called before)
+	def get_events(self, scen_paths, f_progress = None, cancel_event = None):
+		from models.events import RunEvents
+
+		rows = dict()
+		with self.connect() as conn:
+			for i in range(0, len(scen_paths), SQL_CHUNK_SIZE):
+				chunk = scen_paths[i: i+SQL_CHUNK_SIZE]
+				placeholders = ', '.join(['?'] * len(chunk))
+				for row in conn.execute(f'SELECT * FROM events WHERE path IN ({placeholders})', chunk):
+					rows[row[0]] = row
+		conn.close()
+
+		events = {path: RunEvents.from_row(row) for path, row in rows.items()}
+
+		missing_paths = [path for path in scen_paths if path not in rows]
+		parsed = parse_event_files(missing_paths, f_progress=f_progress, cancel_event=cancel_event)
+		if len(parsed) > 0:
+			with self.connect() as conn:
+				conn.executemany('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [run_events.to_row(path) for path, run_events in parsed])
+			conn.close()
+
+		events.update(parsed)
+		return events
+
+	def __repr__(self):
+		return f'StatsCache:{self.db_path}'
+
+	@staticmethod
+	def row_to_scenario(row):
+		scen_path, _, _, name, timestamp = row[:5]
+		data = {key: value for key, value in zip(SUMMARY_KEYS + SETTINGS_KEYS, row[5:]) if value is not None}
+		return Scenario.from_data(scen_path, name, datetime.fromtimestamp(timestamp), data)
+
+	# returns the cache that lives next to the config file
+	@staticmethod
+	def from_config(cfg):
+		return StatsCache(os.path.join(os.path.dirname(cfg.cfg_path), STATS_CACHE_FILENAME))
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import numpy as np
+
+# quantiles of every stats call, also used as the chart ticks (min, quartiles, max)
+STATS_QUANTILES = [0, 0.25, 0.5, 0.75, 1]
+
+# the last runs compared against the whole history
+STATS_RECENT_RUNS = 10
+
+SECONDS_PER_DAY = 24*60*60
+
+# 1970-01-01 was a thursday, days since epoch are shifted so weeks start on monday
+EPOCH_WEEKDAY = 3
+
+# returns the local day (days since epoch) of every timestamp
+# the utc offset is looked up once per distinct hour, so daylight saving changes are followed
+def get_local_days(timestamps):
+	timestamps = np.asarray(timestamps, dtype=np.int64)
+	hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+	offsets = np.array([datetime.fromtimestamp(hour * 3600).astimezone().utcoffset().total_seconds() for hour in hours.tolist()], dtype=np.int64)
+	return (timestamps + offsets[inverse]) // SECONDS_PER_DAY
+
+# returns the week (weeks since epoch, starting on monday) and weekday (0 is monday) of days since epoch
+def get_weeks(days):
+	return (days + EPOCH_WEEKDAY) // 7, (days + EPOCH_WEEKDAY) % 7
+
+# returns the first day (days since epoch) of weeks since epoch
+def get_week_start_days(weeks):
+	return weeks * 7 - EPOCH_WEEKDAY
+
+# returns the quantiles of sorted values, linear interpolation between the closest ranks (as np.quantile)
+def get_sorted_quantiles(values_sorted, quantiles = STATS_QUANTILES):
+	rank = (len(values_sorted) - 1) * np.asarray(quantiles, dtype=np.float64)
+	below = np.floor(rank).astype(np.int64)
+	above = np.minimum(below + 1, len(values_sorted) - 1)
+	weight = rank - below
+	return values_sorted[below] * (1 - weight) + values_sorted[above] * weight
+
+# returns the statistics of a series in one call, from a single sort of the values
+# data_x: timestamps (epoch seconds) of data_y, sorted
+# values (floats, nan values are left out):
+#	n, min, max, mean, std, quantiles (one per STATS_QUANTILES)
+#	slope: linear trend, change of the value per day
+#	recent_mean, recent_delta: mean of the last recent_n values, and its difference with the mean in %
+# returns None if there are no values
+def get_stats(data_x, data_y, recent_n = STATS_RECENT_RUNS):
+	data_x = np.asarray(data_x, dtype=np.float64)
+	data_y = np.asarray(data_y, dtype=np.float64)
+
+	mask = np.isfinite(data_y)
+	if not np.all(mask):
+		data_x = data_x[mask]
+		data_y = data_y[mask]
+
+	n = len(data_y)
+	if n == 0:
+		return None
+
+	values_sorted = np.sort(data_y)
+	quantiles = get_sorted_quantiles(values_sorted)
+
+	mean = data_y.sum() / n
+	centered = data_y - mean
+	std = np.sqrt(np.dot(centered, centered) / n)
+
+	# least squares slope, x in days from the first value
+	days = (data_x - data_x[0]) / SECONDS_PER_DAY
+	days_centered = days - days.sum() / n
+	days_var = np.dot(days_centered, days_centered)
+	slope = np.dot(days_centered, centered) / days_var if days_var > 0 else 0.0
+
+	recent_mean = data_y[-recent_n:].mean()
+	recent_delta = (recent_mean / mean - 1) * 100 if mean != 0 else 0.0
+
+	stats = dict()
+	stats['n'] = n
+	stats['min'] = float(values_sorted[0])
+	stats['max'] = float(values_sorted[-1])
+	stats['mean'] = float(mean)
+	stats['std'] = float(std)
+	stats['quantiles'] = quantiles.tolist()
+	stats['slope'] = float(slope)
+	stats['recent_mean'] = float(recent_mean)
+	stats['recent_delta'] = float(recent_delta)
+	return stats
+
+# returns the aggregates of every week with values, the most recent first
+# data_x: timestamps (epoch seconds), sorted
+# returns a dict of arrays: start (first day of the week, days since epoch), runs, best, mean
+def get_weekly_stats(data_x, data_y):
+	data_y = np.asarray(data_y, dtype=np.float64)
+	mask = np.isfinite(data_y)
+	data_y = data_y[mask]
+	if len(data_y) == 0:
+		return None
+
+	weeks, _ = get_weeks(get_local_days(np.asarray(data_x)[mask]))
+
+	# timestamps are sorted, so are the weeks
+	starts = np.concatenate(([0], np.flatnonzero(np.diff(weeks)) + 1))
+	counts = np.diff(np.append(starts, len(weeks)))
+
+	weekly = dict()
+	weekly['start'] = get_week_start_days(weeks[starts])[::-1]
+	weekly['runs'] = counts[::-1]
+	weekly['best'] = np.maximum.reduceat(data_y, starts)[::-1]
+	weekly['mean'] = (np.add.reduceat(data_y, starts) / counts)[::-1]
+	return weekly
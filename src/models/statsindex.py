@@ -0,0 +1,122 @@
+import os
+import bisect
+import threading
+from datetime import datetime, date, time, timedelta
+
+STAT_FILENAME_SEPARATOR = ' - Challenge - '
+STAT_FILENAME_TIMESTAMP_FORMAT = '%Y.%m.%d-%H.%M.%S Stats.csv'
+
+# splits a kovaaks stat filename into its scenario name and timestamp
+# stat filenames follow: <name> - Challenge - <YYYY.MM.DD-HH.MM.SS> Stats.csv
+# returns None if the filename is not a stat file
+def parse_stat_filename(fname):
+	parts = fname.rsplit(STAT_FILENAME_SEPARATOR, 1)
+	if len(parts) != 2:
+		return None
+
+	try:
+		timestamp = datetime.strptime(parts[1], STAT_FILENAME_TIMESTAMP_FORMAT)
+	except ValueError:
+		return None
+
+	return parts[0], timestamp
+
+# index of the kovaaks stats folder built from the filenames only
+# maps scenario name -> list of (timestamp, path), sorted by timestamp
+# no stat file is opened while building or querying the index
+# the index can be shared between threads (ex: a StatsWatcher adding new files while a report reads it)
+class StatsIndex:
+	def __init__(self, stats_folder = None):
+		self.stats_folder = stats_folder
+		self._entries = dict()
+		self._dir_entries = dict()
+		self._lock = threading.RLock()
+
+		if stats_folder is not None:
+			self.scan()
+
+	# lists the stats folder once and rebuilds the whole index
+	def scan(self):
+		entries_by_name = dict()
+		dir_entries = dict()
+		with os.scandir(self.stats_folder) as it:
+			for entry in it:
+				parsed = parse_stat_filename(entry.name)
+				if parsed is None:
+					continue
+
+				name, timestamp = parsed
+				entries_by_name.setdefault(name, []).append((timestamp, entry.path))
+				dir_entries[entry.path] = entry
+
+		for entries in entries_by_name.values():
+			entries.sort()
+
+		with self._lock:
+			self._entries = entries_by_name
+			self._dir_entries = dir_entries
+
+	# adds a single stat file to the index, keeping the order
+	# returns the scenario name, or None if the path is not a stat file
+	def add(self, scen_path):
+		parsed = parse_stat_filename(os.path.basename(scen_path))
+		if parsed is None:
+			return None
+
+		name, timestamp = parsed
+		entry = (timestamp, scen_path)
+		with self._lock:
+			entries = self._entries.setdefault(name, [])
+			i = bisect.bisect_left(entries, entry)
+			if i == len(entries) or entries[i] != entry:
+				entries.insert(i, entry)
+
+		return name
+
+	# returns (size, mtime_ns) of a stat file, used to validate cached data
+	# the directory entries from the scan are reused when avaliable
+	def get_signature(self, scen_path):
+		entry = self._dir_entries.get(scen_path)
+		st = entry.stat() if entry is not None else os.stat(scen_path)
+		return st.st_size, st.st_mtime_ns
+
+	def get_names(self):
+		with self._lock:
+			names = list(self._entries.keys())
+		names.sort()
+		return names
+
+	# returns the (timestamp, path) entries of a scenario, up to days_n number of days
+	# if days_n is None, then returns all entries
+	def get_entries(self, scenario_name, days_n = None):
+		with self._lock:
+			entries = list(self._entries.get(scenario_name, []))
+
+		if days_n is None:
+			return entries
+
+		# same window as abs((timestamp.date() - today).days) <= days_n
+		today = date.today()
+		start = datetime.combine(today - timedelta(days=days_n), time.min)
+		end = datetime.combine(today + timedelta(days=days_n+1), time.min)
+
+		i = bisect.bisect_left(entries, (start, ''))
+		j = bisect.bisect_left(entries, (end, ''))
+		return entries[i:j]
+
+	def get_paths(self, scenario_name, days_n = None):
+		return [path for _, path in self.get_entries(scenario_name, days_n)]
+
+	def get_all_paths(self):
+		with self._lock:
+			return [path for entries in self._entries.values() for _, path in entries]
+
+	def __contains__(self, scenario_name):
+		return scenario_name in self._entries
+
+	def __len__(self):
+		with self._lock:
+			return sum(len(entries) for entries in self._entries.values())
+
+	def __repr__(self):
+		return f'StatsIndex:{self.stats_folder}'
@@ -0,0 +1,174 @@
+import os
+import sys
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+from models.statsindex import parse_stat_filename
+
+WATCHER_POLL_INTERVAL = 2.0
+
+# a file that still cannot be parsed after this many checks without being modified is given up on,
+# until it is modified again (ex: corrupted file, run without a score)
+WATCHER_MAX_RETRIES = 3
+
+# inotify constants, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT_HEADER = struct.Struct('iIII')
+
+# watches the kovaaks stats folder while the application is running
+# new stat files are parsed into the stats cache and added to the index as soon as they are written,
+# then f_new_runs(scenarios_names) is called (from the watcher thread) with the scenarios that got new runs
+# uses inotify on linux, and polls the folder with os.scandir everywhere else
+class StatsWatcher:
+	def __init__(self, index, cache, f_new_runs, poll_interval = WATCHER_POLL_INTERVAL):
+		self.index = index
+		self.cache = cache
+		self.f_new_runs = f_new_runs
+		self.poll_interval = poll_interval
+
+		self._known_paths = set(index.get_all_paths())
+		# path -> (signature, failed attempts with this signature) of the files to retry
+		self._pending_paths = dict()
+		# path -> signature of the files given up on
+		self._failed_paths = dict()
+		self._stop_event = threading.Event()
+		self._thread = None
+
+	def start(self):
+		target = self.run_inotify if StatsWatcher.load_inotify() is not None else self.run_polling
+		self._thread = threading.Thread(target=target, daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop_event.set()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+	def is_running(self):
+		return self._thread is not None and self._thread.is_alive()
+
+	# parses the new stat files and adds them to the index
+	# files that cannot be parsed yet (ex: still being written) are retried on the next checks,
+	# up to WATCHER_MAX_RETRIES times once their size and mtime stop changing
+	def ingest(self, scen_paths):
+		signatures = dict()
+		for scen_path in set(scen_paths) | self._pending_paths.keys():
+			if scen_path in self._known_paths:
+				continue
+
+			try:
+				st = os.stat(scen_path)
+			except OSError:
+				continue
+
+			# files given up on are only read again once modified
+			signature = (st.st_size, st.st_mtime_ns)
+			if self._failed_paths.get(scen_path) != signature:
+				signatures[scen_path] = signature
+
+		if len(signatures) == 0:
+			self._pending_paths = dict()
+			return
+
+		rows = self.cache.ingest(self.index, list(signatures.keys()))
+
+		pending_paths = dict()
+		for scen_path, signature in signatures.items():
+			if scen_path in rows:
+				continue
+
+			previous_signature, attempts = self._pending_paths.get(scen_path, (None, 0))
+			attempts = attempts + 1 if signature == previous_signature else 1
+			if attempts > WATCHER_MAX_RETRIES:
+				self._failed_paths[scen_path] = signature
+			else:
+				pending_paths[scen_path] = (signature, attempts)
+		self._pending_paths = pending_paths
+
+		names = set()
+		for scen_path in rows:
+			names.add(self.index.add(scen_path))
+			self._known_paths.add(scen_path)
+			self._failed_paths.pop(scen_path, None)
+
+		if len(names) > 0:
+			self.f_new_runs(names)
+
+	# polling fallback: checks the folder mtime every poll_interval seconds,
+	# the folder is only listed when a file was added (or a previous file is still pending)
+	def run_polling(self):
+		folder_mtime_ns = None
+		while not self._stop_event.wait(self.poll_interval):
+			try:
+				mtime_ns = os.stat(self.index.stats_folder).st_mtime_ns
+				if mtime_ns == folder_mtime_ns and len(self._pending_paths) == 0:
+					continue
+
+				new_paths = self.list_folder_paths()
+			except OSError:
+				continue
+
+			folder_mtime_ns = mtime_ns
+			self.ingest(new_paths)
+
+	def run_inotify(self):
+		libc = StatsWatcher.load_inotify()
+		fd = libc.inotify_init()
+		if fd < 0 or libc.inotify_add_watch(fd, os.fsencode(self.index.stats_folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+			if fd >= 0:
+				os.close(fd)
+			self.run_polling()
+			return
+
+		try:
+			# files written between the index scan and the watch setup
+			self.ingest(self.list_folder_paths())
+
+			while not self._stop_event.is_set():
+				ready, _, _ = select.select([fd], [], [], self.poll_interval)
+				if len(ready) == 0:
+					# retries the files that could not be parsed yet
+					self.ingest([])
+					continue
+
+				buffer = os.read(fd, 64*1024)
+				new_paths = []
+				offset = 0
+				while offset < len(buffer):
+					_, _, _, name_len = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+					offset += INOTIFY_EVENT_HEADER.size
+					name = os.fsdecode(buffer[offset: offset+name_len].rstrip(b'\0'))
+					offset += name_len
+
+					if parse_stat_filename(name) is not None:
+						new_paths.append(os.path.join(self.index.stats_folder, name))
+
+				self.ingest(new_paths)
+		finally:
+			os.close(fd)
+
+	# lists the stat files of the folder that are not in the index yet
+	def list_folder_paths(self):
+		with os.scandir(self.index.stats_folder) as it:
+			return [entry.path for entry in it if entry.path not in self._known_paths and parse_stat_filename(entry.name) is not None]
+
+	# returns libc if inotify is avaliable, otherwise None
+	@staticmethod
+	def load_inotify():
+		if not sys.platform.startswith('linux'):
+			return None
+
+		libc_name = ctypes.util.find_library('c')
+		if libc_name is None:
+			return None
+
+		libc = ctypes.CDLL(libc_name, use_errno=True)
+		if not hasattr(libc, 'inotify_init'):
+			return None
+
+		return libc
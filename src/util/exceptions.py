@@ -5,3 +5,7 @@ class ModeSelectionException(Exception):
 class DifferentScenariosException(Exception):
 	def __init__(self, message):
 		super().__init__(message)
+
+class ReportCancelledException(Exception):
+	def __init__(self, message):
+		super().__init__(message)
@@ -0,0 +1,105 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import contextlib
+
+TIMING_LOG_FILENAME = 'timing.log'
+PROFILE_STATS_FILENAME = 'profile.prof'
+PROFILE_SUMMARY_FILENAME = 'profile.txt'
+
+# number of functions listed in the profile summary
+PROFILE_SUMMARY_LINES = 40
+
+# shared by every disabled timer, entering it costs a method call and nothing else
+NULL_STAGE = contextlib.nullcontext()
+
+# measures one stage, adds its duration to the timer on exit
+class Stage:
+	def __init__(self, timer, name):
+		self.timer = timer
+		self.name = name
+		self.t0 = None
+
+	def __enter__(self):
+		self.t0 = time.perf_counter()
+		return self
+
+	def __exit__(self, *args):
+		self.timer.add(self.name, time.perf_counter() - self.t0)
+		return False
+
+# accumulates the wall time of named stages
+# usage:
+#	timer = StageTimer(enabled=True)
+#	with timer.stage('load stats'):
+#		...
+# stages entered many times are summed, they are listed in the order they were first entered
+class StageTimer:
+	def __init__(self, enabled = False):
+		self.enabled = enabled
+		self._totals = dict()
+		self._t0 = time.perf_counter()
+
+	def stage(self, name):
+		if not self.enabled:
+			return NULL_STAGE
+
+		return Stage(self, name)
+
+	def add(self, name, seconds):
+		total = self._totals.setdefault(name, [0.0, 0])
+		total[0] += seconds
+		total[1] += 1
+
+	# returns a dict stage name -> (seconds, calls)
+	def get_totals(self):
+		return {name: tuple(total) for name, total in self._totals.items()}
+
+	# returns the seconds since the timer was created
+	def get_elapsed(self):
+		return time.perf_counter() - self._t0
+
+	def get_summary_lines(self):
+		elapsed = self.get_elapsed()
+		lines = [f'{"stage":<24} {"total":>10} {"calls":>7} {"share":>7}']
+		for name, (seconds, calls) in self._totals.items():
+			share = seconds / elapsed if elapsed > 0 else 0
+			lines.append(f'{name:<24} {seconds*1000:8.1f}ms {calls:>7} {share:>7.1%}')
+
+		lines.append(f'{"elapsed":<24} {elapsed*1000:8.1f}ms')
+		return lines
+
+	def get_summary(self):
+		return '\n'.join(self.get_summary_lines())
+
+	def write_log(self, fpath, title = None):
+		with io.open(fpath, 'w', encoding='utf-8') as fp:
+			if title is not None:
+				fp.write(f'{title}\n')
+			fp.write(self.get_summary() + '\n')
+
+	def __repr__(self):
+		return f'StageTimer:{"enabled" if self.enabled else "disabled"}({len(self._totals)} stages)'
+
+# profiles the enclosed code with cProfile if enabled
+# the raw stats (for pstats, snakeviz, etc) and a text summary sorted by cumulative time are written to folder_path
+# only the calling thread is profiled, work done in worker processes is not
+@contextlib.contextmanager
+def profile(enabled, folder_path):
+	if not enabled:
+		yield None
+		return
+
+	profiler = cProfile.Profile()
+	profiler.enable()
+	try:
+		yield profiler
+	finally:
+		profiler.disable()
+		profiler.dump_stats(os.path.join(folder_path, PROFILE_STATS_FILENAME))
+
+		with io.open(os.path.join(folder_path, PROFILE_SUMMARY_FILENAME), 'w', encoding='utf-8') as fp:
+			stats = pstats.Stats(profiler, stream=fp)
+			stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_SUMMARY_LINES)
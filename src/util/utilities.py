@@ -1,5 +1,12 @@
 import datetime
 
+from util.exceptions import ReportCancelledException
+
 def avg_datetime(timestamps_list):
 	timestamps = [dt.timestamp() for dt in timestamps_list]
 	return datetime.datetime.fromtimestamp(sum(timestamps)/len(timestamps))
+
+# raises ReportCancelledException if the cancel event (threading.Event) is set
+def check_cancelled(cancel_event):
+	if cancel_event is not None and cancel_event.is_set():
+		raise ReportCancelledException('Report generation cancelled')
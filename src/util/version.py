@@ -1,12 +1,17 @@
 from __future__ import annotations
 import os
-import requests
+import io
+import json
+import time
 
 from models.config import Config
 
 VERSION_FILENAME = 'VERSION'
 VERSION_REMOTE_URL = 'https://raw.githubusercontent.com/drizak/kovaaks-stats-visualizer/main/src/VERSION'
 
+VERSION_CACHE_FILENAME = 'version_cache.json'
+VERSION_CACHE_TTL = 24*60*60
+
 class VersionChecker:
     def __init__(self):
         self.version = None
@@ -24,10 +29,30 @@ class VersionChecker:
             self.set(version)
 
     def load_remote_version(self):
+        # imported here, requests is only needed for the remote check
+        import requests
+
         r = requests.get(url=VERSION_REMOTE_URL, timeout=5)
         version = self.parse_version_text(r.text)
         self.set(version)
 
+    # loads the remote version, the result is cached on disk for ttl seconds
+    def load_remote_version_cached(self, cache_path, ttl = VERSION_CACHE_TTL):
+        try:
+            with io.open(cache_path, 'r') as fp:
+                cache = json.load(fp)
+
+            if 0 <= time.time() - cache['checked_at'] < ttl:
+                self.set(self.parse_version_text(cache['version']))
+                return
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        self.load_remote_version()
+
+        with io.open(cache_path, 'w') as fp:
+            json.dump({'checked_at': time.time(), 'version': str(self)}, fp)
+
     def parse_version_text(self, version_text):
         version = [int(n) for n in version_text.strip('\n').split('.')]
         return version